@@ -0,0 +1,119 @@
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Hashable, Optional
+
+from config import ADMIN_CACHE_MAX_SIZE, ADMIN_CACHE_TTL, USERS_COUNT_CACHE_TTL
+from dep.db import GetAsyncDB
+from dep.db.async_crud import get_admin_by_telegram_id, get_users_count
+
+
+@dataclass(frozen=True)
+class AdminSnapshot:
+    """Read-only copy of the admin columns the bot needs, safe to keep outside a DB session."""
+    id: int
+    username: str
+    telegram_id: int
+    is_sudo: bool
+    hakobot_balance: int
+    hakobot_gb_fee: int
+
+    @classmethod
+    def from_orm(cls, admin) -> "AdminSnapshot":
+        return cls(
+            id=admin.id,
+            username=admin.username,
+            telegram_id=admin.telegram_id,
+            is_sudo=bool(admin.is_sudo),
+            hakobot_balance=admin.hakobot_balance,
+            hakobot_gb_fee=admin.hakobot_gb_fee,
+        )
+
+
+class TTLCache:
+    """Size-bounded LRU whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# AdminSnapshot keyed by telegram_id
+admin_cache = TTLCache(max_size=ADMIN_CACHE_MAX_SIZE, ttl=ADMIN_CACHE_TTL)
+# user counts keyed by admin id, None for the whole panel
+users_count_cache = TTLCache(max_size=ADMIN_CACHE_MAX_SIZE, ttl=USERS_COUNT_CACHE_TTL)
+
+
+async def resolve_admin(telegram_id: int) -> Optional[AdminSnapshot]:
+    """Returns the cached admin for `telegram_id`, loading it from the database on a miss."""
+    admin = admin_cache.get(telegram_id)
+    if admin is not None:
+        return admin
+
+    async with GetAsyncDB() as db:
+        admin_obj = await get_admin_by_telegram_id(db, telegram_id)
+
+    if not admin_obj:
+        return None
+
+    admin = AdminSnapshot.from_orm(admin_obj)
+    admin_cache.set(telegram_id, admin)
+    return admin
+
+
+def invalidate_admin(telegram_id: int) -> None:
+    """Drops the cached record, call it whenever an admin's balance or sudo status changes."""
+    admin_cache.invalidate(int(telegram_id))
+
+
+@asynccontextmanager
+async def wallet_session(telegram_id: int) -> AsyncIterator:
+    """
+    Session for dep.db.wallet debits and credits of an admin and whatever they pay for, committed
+    when the block exits without an error, after which the cached record of the admin is dropped.
+    """
+    async with GetAsyncDB() as db:
+        yield db
+        await db.commit()
+    invalidate_admin(telegram_id)
+
+
+async def get_cached_users_count(admin: Optional[AdminSnapshot] = None) -> int:
+    """Number of users (of `admin`, or of the whole panel) refreshed at most every USERS_COUNT_CACHE_TTL seconds."""
+    key = admin.id if admin else None
+    count = users_count_cache.get(key)
+    if count is not None:
+        return count
+
+    async with GetAsyncDB() as db:
+        count = await get_users_count(db, admin=admin)
+
+    users_count_cache.set(key, count)
+    return count
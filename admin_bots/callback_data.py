@@ -0,0 +1,107 @@
+"""
+Compact, versioned encoding of inline keyboard callback_data.
+
+Every action has a one character code and a schema of argument codecs, a packed
+payload looks like "<version><code>[:arg...]", e.g. "2x" for `cancel`.
+Integers are written in base 36, so a telegram id fits in 7 characters and the
+64 byte limit leaves room for several arguments. Bumping CALLBACK_DATA_VERSION
+makes buttons of older messages fail to unpack instead of being misread.
+"""
+import string
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, NamedTuple, Tuple
+
+CALLBACK_DATA_VERSION = "2"
+MAX_CALLBACK_DATA_BYTES = 64
+SEPARATOR = ":"
+
+_BASE36_DIGITS = string.digits + string.ascii_lowercase
+
+
+def _int_to_base36(value: int) -> str:
+    if value < 0:
+        return "-" + _int_to_base36(-value)
+    digits = []
+    while True:
+        value, remainder = divmod(value, 36)
+        digits.append(_BASE36_DIGITS[remainder])
+        if not value:
+            return "".join(reversed(digits))
+
+
+def _encode_str(value: Any) -> str:
+    value = str(value)
+    if SEPARATOR in value:
+        raise ValueError(f"callback argument must not contain «{SEPARATOR}»: {value}")
+    return value
+
+
+class Codec(NamedTuple):
+    encode: Callable[[Any], str]
+    decode: Callable[[str], Any]
+
+
+INT = Codec(_int_to_base36, lambda value: int(value, 36))
+STR = Codec(_encode_str, str)
+
+
+class Action(NamedTuple):
+    code: str
+    args: Tuple[Codec, ...] = ()
+
+
+ACTIONS: Dict[str, Action] = {
+    "create_admin": Action("a"),
+    "confirm_create_admin": Action("k"),
+    "cancel": Action("x"),
+    # page, direction ("n"ext/"p"revious), created_at of the cursor row in µs since epoch, its id
+    "users": Action("u", (INT, STR, INT, INT)),
+    "create_subscription_action_duration": Action("d", (STR,)),
+    "create_subscription_action_size": Action("s", (STR,)),
+    "create_subscription_action_confirm": Action("c", (STR,)),
+    "approve": Action("p", (INT,)),
+    "reject": Action("r", (INT,)),
+    # id of the oldest payment on the previous page, 0 for the newest page
+    "transactions": Action("t", (INT,)),
+}
+
+_ACTIONS_BY_CODE = {action.code: name for name, action in ACTIONS.items()}
+assert len(_ACTIONS_BY_CODE) == len(ACTIONS), "callback action codes must be unique"
+
+
+def pack(name: str, *args: Any) -> str:
+    action = ACTIONS[name]
+    if len(args) != len(action.args):
+        raise ValueError(f"callback {name} expects {len(action.args)} arguments, got {len(args)}")
+
+    data = CALLBACK_DATA_VERSION + action.code + "".join(
+        SEPARATOR + codec.encode(arg) for codec, arg in zip(action.args, args))
+    if len(data.encode()) > MAX_CALLBACK_DATA_BYTES:
+        raise ValueError(f"callback data of {name} is longer than {MAX_CALLBACK_DATA_BYTES} bytes")
+    return data
+
+
+def unpack(data: str) -> Tuple[str, Tuple[Any, ...]]:
+    head, *raw_args = data.split(SEPARATOR)
+    if len(head) != len(CALLBACK_DATA_VERSION) + 1 or not head.startswith(CALLBACK_DATA_VERSION):
+        raise ValueError(f"unsupported callback data: {data}")
+
+    name = _ACTIONS_BY_CODE.get(head[-1])
+    if name is None:
+        raise ValueError(f"unknown callback action: {data}")
+
+    action = ACTIONS[name]
+    if len(raw_args) != len(action.args):
+        raise ValueError(f"callback {name} expects {len(action.args)} arguments, got {len(raw_args)}")
+    return name, tuple(codec.decode(arg) for codec, arg in zip(action.args, raw_args))
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def datetime_to_micros(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def micros_to_datetime(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Dict
+
+from telegram.ext import BaseUpdateProcessor
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates from different chats concurrently (bounded by max_concurrent_updates)
+    while updates that belong to the same chat run strictly in arrival order, so the
+    step/awaiting_* state kept in user_data never races with itself.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._chat_locks: Dict[Any, asyncio.Lock] = {}
+        self._chat_waiters: Dict[Any, int] = {}
+
+    @staticmethod
+    def _chat_key(update: object) -> Any:
+        chat = getattr(update, "effective_chat", None)
+        if chat is not None:
+            return chat.id
+        user = getattr(update, "effective_user", None)
+        if user is not None:
+            return user.id
+        return None
+
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        # the chat lock is taken before the semaphore (which super().process_update holds while
+        # processing), so updates queued behind their chat don't occupy slots other chats need.
+        # process_update is only @final for type checkers.
+        key = self._chat_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+
+        lock = self._chat_locks.setdefault(key, asyncio.Lock())
+        self._chat_waiters[key] = self._chat_waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._chat_waiters[key] -= 1
+            if not self._chat_waiters[key]:
+                del self._chat_waiters[key]
+                del self._chat_locks[key]
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._chat_locks.clear()
+        self._chat_waiters.clear()
@@ -1,9 +1,7 @@
 from functools import wraps
 from telegram import Update
 from telegram.ext import ContextTypes
-from dep.db import GetDB  # update path if needed
-
-from dep.db.crud import get_admin_by_telegram_id
+from cache import resolve_admin
 
 
 def permission_required(admin=False, superuser=False):
@@ -18,27 +16,26 @@ def permission_required(admin=False, superuser=False):
                 return
 
             try:
-                # Open sync DB session inside async context (if using async SQLAlchemy, adapt accordingly)
-                with GetDB() as db:
-                    admin_obj = get_admin_by_telegram_id(db, user_id)
+                admin_obj = await resolve_admin(user_id)
 
-                    if not admin_obj:
-                        await update.message.reply_text("🚫 دسترسی غیرمجاز: شما ادمین نیستید.")
-                        return
+                if not admin_obj:
+                    await update.message.reply_text("🚫 دسترسی غیرمجاز: شما ادمین نیستید.")
+                    return
 
-                    if superuser and not admin_obj.is_sudo:
-                        await update.message.reply_text("🚫 فقط سوپر یوزرها اجازه دارند.")
-                        return
+                if superuser and not admin_obj.is_sudo:
+                    await update.message.reply_text("🚫 فقط سوپر یوزرها اجازه دارند.")
+                    return
 
-                    if admin and not admin_obj:
-                        await update.message.reply_text("🚫 فقط ادمین‌ها اجازه دارند.")
-                        return
+                if admin and not admin_obj:
+                    await update.message.reply_text("🚫 فقط ادمین‌ها اجازه دارند.")
+                    return
 
             except Exception as e:
                 await update.message.reply_text("⚠️ خطایی در بررسی دسترسی رخ داد.")
                 return
 
-            # Passed all checks
+            # Passed all checks, downstream handlers reuse the resolved admin
+            context.admin = admin_obj
             return await func(update, context, *args, **kwargs)
 
         return wrapper
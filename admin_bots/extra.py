@@ -38,6 +38,65 @@ def add_column_if_not_exists(table: str, column: str, alter_sql: str):
         print(f"Error checking table '{table}': {e}")
 
 
+def create_index_if_not_exists(table: str, index: str, create_sql: str):
+    try:
+        inspector = inspect(engine)
+        indexes = [idx['name'] for idx in inspector.get_indexes(table)]
+
+        if index not in indexes:
+            print(f"Creating '{index}' index on '{table}' table...")
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text(create_sql))
+                    conn.commit()
+                    print(f"'{index}' index created on '{table}' successfully.")
+            except (ProgrammingError, OperationalError) as e:
+                print(f"Failed to create index '{index}' on '{table}': {e}")
+        else:
+            print(f"'{index}' index already exists on '{table}'.")
+    except Exception as e:
+        print(f"Error checking table '{table}': {e}")
+
+
+def setup_users_search_index():
+    """Full-text index used by the substring tier of user search: FTS5 trigram table on SQLite, ngram FULLTEXT on MySQL."""
+    if engine.dialect.name == "sqlite":
+        inspector = inspect(engine)
+        if "users_fts" in inspector.get_table_names():
+            print("'users_fts' table already exists.")
+            return
+
+        print("Creating 'users_fts' table...")
+        statements = [
+            "CREATE VIRTUAL TABLE users_fts USING fts5("
+            "username, note, content='users', content_rowid='id', tokenize='trigram')",
+            "CREATE TRIGGER users_fts_ai AFTER INSERT ON users BEGIN "
+            "INSERT INTO users_fts(rowid, username, note) VALUES (new.id, new.username, new.note); END",
+            "CREATE TRIGGER users_fts_ad AFTER DELETE ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, username, note) "
+            "VALUES ('delete', old.id, old.username, old.note); END",
+            "CREATE TRIGGER users_fts_au AFTER UPDATE OF username, note ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, username, note) "
+            "VALUES ('delete', old.id, old.username, old.note); "
+            "INSERT INTO users_fts(rowid, username, note) VALUES (new.id, new.username, new.note); END",
+            "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+        ]
+        try:
+            with engine.connect() as conn:
+                for statement in statements:
+                    conn.execute(text(statement))
+                conn.commit()
+                print("'users_fts' table created successfully.")
+        except (ProgrammingError, OperationalError) as e:
+            print(f"Failed to create table 'users_fts': {e}")
+    else:
+        create_index_if_not_exists(
+            "users",
+            "ft_users_username_note",
+            "CREATE FULLTEXT INDEX ft_users_username_note ON users (username, note) WITH PARSER ngram"
+        )
+
+
 def setup_hakobot_schema():
     inspector = inspect(engine)
 
@@ -56,6 +115,76 @@ def setup_hakobot_schema():
         """
     )
 
+    # کلید یکتا برای جلوگیری از ثبت دوباره یک تراکنش
+    add_column_if_not_exists(
+        "payments",
+        "idempotency_key",
+        "ALTER TABLE payments ADD COLUMN idempotency_key VARCHAR(64) NULL"
+    )
+    create_index_if_not_exists(
+        "payments",
+        "ux_payments_idempotency_key",
+        "CREATE UNIQUE INDEX ux_payments_idempotency_key ON payments (idempotency_key)"
+    )
+
+    # صفحه‌بندی تراکنش‌های هر ادمین بر اساس id
+    create_index_if_not_exists(
+        "payments",
+        "ix_payments_admin_id_id",
+        "CREATE INDEX ix_payments_admin_id_id ON payments (admin_id, id)"
+    )
+
+    # جدول تصویر روزانه/ماهانه موجودی برای محاسبه مانده تراکنش‌ها
+    create_table_if_not_exists(
+        "hakobot_balance_snapshots",
+        """
+        CREATE TABLE hakobot_balance_snapshots (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            admin_id INT NOT NULL,
+            period VARCHAR(8) NOT NULL,
+            last_payment_id INT NOT NULL,
+            balance BIGINT NOT NULL,
+            taken_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (admin_id) REFERENCES admins(id)
+        )
+        """
+    )
+    create_index_if_not_exists(
+        "hakobot_balance_snapshots",
+        "ix_balance_snapshots_admin_id_last_payment_id",
+        "CREATE INDEX ix_balance_snapshots_admin_id_last_payment_id "
+        "ON hakobot_balance_snapshots (admin_id, last_payment_id)"
+    )
+
+    # جدول شمارنده‌های کاربران به تفکیک ادمین و وضعیت
+    create_table_if_not_exists(
+        "hakobot_user_counters",
+        """
+        CREATE TABLE hakobot_user_counters (
+            admin_id INT NOT NULL,
+            status ENUM('active', 'disabled', 'limited', 'expired', 'on_hold') NOT NULL,
+            users_count BIGINT NOT NULL DEFAULT 0,
+            used_traffic BIGINT NOT NULL DEFAULT 0,
+            data_limit BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (admin_id, status)
+        )
+        """
+    )
+
+    # جدول پیشرفت عملیات‌های گروهی برای ادامه پس از قطعی
+    create_table_if_not_exists(
+        "hakobot_bulk_jobs",
+        """
+        CREATE TABLE hakobot_bulk_jobs (
+            name VARCHAR(64) NOT NULL PRIMARY KEY,
+            last_id INT NOT NULL DEFAULT 0,
+            processed INT NOT NULL DEFAULT 0,
+            started_at DATETIME NULL,
+            updated_at DATETIME NULL
+        )
+        """
+    )
+
     # افزودن ستون hakobot_balance به جدول admins
     add_column_if_not_exists(
         "admins",
@@ -69,5 +198,22 @@ def setup_hakobot_schema():
         "ALTER TABLE admins ADD COLUMN hakobot_gb_fee BIGINT NOT NULL DEFAULT 2000"
     )
 
+    # ایندکس برای صفحه‌بندی keyset لیست کاربران (created_at, id)
+    create_index_if_not_exists(
+        "users",
+        "ix_users_created_at_id",
+        "CREATE INDEX ix_users_created_at_id ON users (created_at, id)"
+    )
+
+    # ایندکس برای لیست کاربران هر ادمین، صفحه هر نماینده فقط ردیف‌های خودش را می‌خواند
+    create_index_if_not_exists(
+        "users",
+        "ix_users_admin_id_created_at_id",
+        "CREATE INDEX ix_users_admin_id_created_at_id ON users (admin_id, created_at, id)"
+    )
+
+    # ایندکس متنی برای جستجوی کاربران (نام کاربری و یادداشت)
+    setup_users_search_index()
+
 if __name__ == "__main__":
     setup_hakobot_schema()
\ No newline at end of file
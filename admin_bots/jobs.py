@@ -0,0 +1,44 @@
+import asyncio
+from datetime import datetime
+
+from config import (
+    BALANCE_SNAPSHOTS_DAILY_RETENTION_DAYS,
+    JOB_BALANCE_SNAPSHOTS_INTERVAL,
+    JOB_RECONCILE_USER_COUNTERS_INTERVAL,
+)
+from dep.db import GetAsyncDB
+from dep.db.async_crud import reconcile_user_counters
+from dep.db.wallet import prune_balance_snapshots, take_balance_snapshots
+
+
+async def reconcile_user_counters_job():
+    """Rebuilds the materialized user counters on startup and then every interval."""
+    while True:
+        try:
+            async with GetAsyncDB() as db:
+                await reconcile_user_counters(db)
+        except Exception as e:
+            print(f"❗️خطا در بازسازی شمارنده‌های کاربران: {e}")
+        await asyncio.sleep(JOB_RECONCILE_USER_COUNTERS_INTERVAL)
+
+
+async def balance_snapshots_job():
+    """Snapshots wallet balances every interval, plus a monthly snapshot on the first run of each month."""
+    last_month = None
+    while True:
+        try:
+            async with GetAsyncDB() as db:
+                await take_balance_snapshots(db, "day")
+                month = datetime.utcnow().strftime("%Y-%m")
+                if month != last_month:
+                    await take_balance_snapshots(db, "month")
+                    last_month = month
+                await prune_balance_snapshots(db, "day", BALANCE_SNAPSHOTS_DAILY_RETENTION_DAYS)
+        except Exception as e:
+            print(f"❗️خطا در ثبت تصویر موجودی کیف پول‌ها: {e}")
+        await asyncio.sleep(JOB_BALANCE_SNAPSHOTS_INTERVAL)
+
+
+async def start_jobs(application):
+    application.create_task(reconcile_user_counters_job())
+    application.create_task(balance_snapshots_job())
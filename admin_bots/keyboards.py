@@ -1,9 +1,15 @@
+from functools import cache
+
 from telegram import KeyboardButton, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 
+from callback_data import datetime_to_micros, pack
+
 
 class BotKeyboard:
+    # keyboards without per-user data are built once and shared, telegram objects are immutable
 
     @staticmethod
+    @cache
     def get_main_menu(super_user: bool):
         keyboard = [
             [KeyboardButton("📦 ساخت اشتراک")],
@@ -19,50 +25,53 @@ class BotKeyboard:
         return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
 
     @staticmethod
+    @cache
     def get_the_duration_of_packets():
         keyboard = [
             [
-                InlineKeyboardButton("۳ ماهه", callback_data="create_subscription_action_duration:3"),
-                InlineKeyboardButton("۱ ماهه", callback_data="create_subscription_action_duration:1"),
+                InlineKeyboardButton("۳ ماهه", callback_data=pack("create_subscription_action_duration", "3")),
+                InlineKeyboardButton("۱ ماهه", callback_data=pack("create_subscription_action_duration", "1")),
 
             ],
             [
-                InlineKeyboardButton("۶ ماهه", callback_data="create_subscription_action_duration:6")
+                InlineKeyboardButton("۶ ماهه", callback_data=pack("create_subscription_action_duration", "6"))
             ],
             [
-                InlineKeyboardButton("دوره دلخواه", callback_data="create_subscription_action_duration:x")
+                InlineKeyboardButton("دوره دلخواه", callback_data=pack("create_subscription_action_duration", "x"))
             ],
         ]
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @cache
     def admins_management_menu():
         keyboard = [
             [
-                InlineKeyboardButton("جستجو ادمین", callback_data="create_subscription_action_duration:1"),
-                InlineKeyboardButton("ساخت ادمین", callback_data="create_admin"),
+                InlineKeyboardButton("جستجو ادمین", callback_data=pack("create_subscription_action_duration", "1")),
+                InlineKeyboardButton("ساخت ادمین", callback_data=pack("create_admin")),
             ],
             [
-                InlineKeyboardButton("لیست ادمین ها", callback_data="create_subscription_action_duration:3"),
+                InlineKeyboardButton("لیست ادمین ها", callback_data=pack("create_subscription_action_duration", "3")),
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @cache
     def get_the_size_of_packets():
         keyboard = [
             [
-                InlineKeyboardButton("۵۰ گیگ", callback_data="create_subscription_action_size:50"),
-                InlineKeyboardButton("۳۰ گیگ", callback_data="create_subscription_action_size:30")
+                InlineKeyboardButton("۵۰ گیگ", callback_data=pack("create_subscription_action_size", "50")),
+                InlineKeyboardButton("۳۰ گیگ", callback_data=pack("create_subscription_action_size", "30"))
             ],
             [
-                InlineKeyboardButton("۸۰ گیگ", callback_data="create_subscription_action_size:80")
+                InlineKeyboardButton("۸۰ گیگ", callback_data=pack("create_subscription_action_size", "80"))
             ],
             [
-                InlineKeyboardButton("حجم دلخواه", callback_data="create_subscription_action_size:x")
+                InlineKeyboardButton("حجم دلخواه", callback_data=pack("create_subscription_action_size", "x"))
             ],
             [
-                InlineKeyboardButton("بازگشت", callback_data="create_subscription_action_size:back")
+                InlineKeyboardButton("بازگشت", callback_data=pack("create_subscription_action_size", "back"))
             ]
         ]
         return InlineKeyboardMarkup(keyboard)
@@ -84,7 +93,7 @@ class BotKeyboard:
                 user_status = ''  # expired
 
             row.append(InlineKeyboardButton(f"{user.username} {user_status}",
-                                            callback_data="create_subscription_action_size:50"))
+                                            callback_data=pack("create_subscription_action_size", "50")))
             if i % 2 == 0:
                 keyboard.append(row)
                 row = []
@@ -92,38 +101,50 @@ class BotKeyboard:
             keyboard.append(row)
 
         if total_pages > 1:
-            if page < total_pages:
+            if page < total_pages and users:
                 keyboard.append([InlineKeyboardButton(
                     text="صفحه بعد",
-                    callback_data=f'users:{page + 1}'
+                    callback_data=pack("users", page + 1, "n", datetime_to_micros(users[-1].created_at),
+                                       users[-1].id)
                 )])
 
-            if page > 1:
+            if page > 1 and users:
                 keyboard.append([InlineKeyboardButton(
                     text="صفحه قبل",
-                    callback_data=f'users:{page - 1}'
+                    callback_data=pack("users", page - 1, "p", datetime_to_micros(users[0].created_at),
+                                       users[0].id)
                 )])
 
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    @cache
     def wallet_menu():
         keyboard = [
             [
-                InlineKeyboardButton("📜 لیست تراکنش‌ها", callback_data="create_subscription_action_duration:3"),
-                InlineKeyboardButton("💵 افزایش موجودی", callback_data="create_subscription_action_duration:3"),
+                InlineKeyboardButton("📜 لیست تراکنش‌ها", callback_data=pack("transactions", 0)),
+                InlineKeyboardButton("💵 افزایش موجودی", callback_data=pack("create_subscription_action_duration", "3")),
             ],
         ]
 
         return InlineKeyboardMarkup(keyboard)
 
     @staticmethod
+    def transactions_menu(before_id=None):
+        keyboard = []
+        if before_id:
+            keyboard.append([InlineKeyboardButton("تراکنش‌های قدیمی‌تر", callback_data=pack("transactions", before_id))])
+        return InlineKeyboardMarkup(keyboard)
+
+    @staticmethod
+    @cache
     def cancel():
-        return InlineKeyboardMarkup([[InlineKeyboardButton("انصراف", callback_data="cancel")]])
+        return InlineKeyboardMarkup([[InlineKeyboardButton("انصراف", callback_data=pack("cancel"))]])
 
     @staticmethod
+    @cache
     def confirm_create_admin():
         return InlineKeyboardMarkup([
-            [InlineKeyboardButton(" تایید نهایی", callback_data="confirm_create_admin")],
-            [InlineKeyboardButton("انصراف", callback_data="cancel")]
+            [InlineKeyboardButton(" تایید نهایی", callback_data=pack("confirm_create_admin"))],
+            [InlineKeyboardButton("انصراف", callback_data=pack("cancel"))]
         ])
@@ -21,7 +21,10 @@ Features:
 Wallet System:
 Each subscription or renewal deducts a specific amount (per GB) from the admin's wallet based on the price set by the superuser.
 """
+import asyncio
 import math
+from collections import Counter
+from functools import cache
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
 from telegram.ext import (
@@ -38,20 +41,41 @@ import jdatetime
 
 from telegram import BotCommand
 
-from db.crud import get_admin_by_telegram_id
-from dep.db import GetDB, crud
+from dep.db import GetAsyncDB
+from dep.db import async_crud as crud
+from dep.db import wallet
+from dep.db.models import PaymentType
+from callback_data import micros_to_datetime, pack
+from cache import get_cached_users_count, invalidate_admin, resolve_admin
+from concurrency import PerChatUpdateProcessor
 from decorators import permission_required
+from jobs import start_jobs
 from utils.watermark import set_watermark
 from keyboards import BotKeyboard
+from router import CallbackRouter
+from webhook import run_webhook
 
 load_dotenv()  # Load environment variables from .env file
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHANNEL_ID = os.getenv("CHANNEL_ID")
+# number of updates handled in parallel (different chats only), 0 or 1 keeps sequential processing
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", 0))
+# public https url telegram posts updates to, leave empty to use long polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN", "")
+
+USERS_PAGE_SIZE = 11
+SEARCH_RESULTS_LIMIT = 20
+TRANSACTIONS_PAGE_SIZE = 10
 
 if not TELEGRAM_BOT_TOKEN:
     raise ValueError("🚨 TOKEN not found in .env")
 
+if WEBHOOK_URL and not WEBHOOK_SECRET_TOKEN:
+    raise ValueError("🚨 WEBHOOK_SECRET_TOKEN is required when WEBHOOK_URL is set")
+
 
 async def init_user_data(context):
     context.user_data["bot_message_ids"] = []
@@ -60,17 +84,35 @@ async def init_user_data(context):
     context.user_data["awaiting_wallet"] = False
 
 
+# Telegram accepts at most 100 ids per deleteMessages call
+DELETE_MESSAGES_BATCH = 100
+
+# failed message deletions, keyed by error type
+message_cleanup_failures = Counter()
+
+
+async def delete_messages(bot, chat_id, message_ids):
+    for i in range(0, len(message_ids), DELETE_MESSAGES_BATCH):
+        batch = message_ids[i:i + DELETE_MESSAGES_BATCH]
+        try:
+            await bot.delete_messages(chat_id=chat_id, message_ids=batch)
+            continue
+        except Exception:
+            # bulk delete fails as a whole (e.g. one message is too old), retry one by one
+            pass
+
+        results = await asyncio.gather(
+            *(bot.delete_message(chat_id=chat_id, message_id=msg_id) for msg_id in batch),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                message_cleanup_failures[type(result).__name__] += 1
+
+
 async def send_and_store(update, context, text, reply_markup=None, parse_mode=None):
     chat_id = update.effective_chat.id
 
-    if "bot_message_ids" in context.user_data:
-        for msg_id in context.user_data["bot_message_ids"]:
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=msg_id)
-            except Exception as e:
-                print(f"❗️خطا در حذف پیام {msg_id}: {e}")
-    context.user_data["bot_message_ids"] = []
-
     sent_message = await context.bot.send_message(
         chat_id=chat_id,
         text=text,
@@ -78,7 +120,11 @@ async def send_and_store(update, context, text, reply_markup=None, parse_mode=No
         parse_mode=parse_mode
     )
 
-    context.user_data["bot_message_ids"].append(sent_message.message_id)
+    # clean up the previous messages after the new one is on screen
+    old_message_ids = context.user_data.get("bot_message_ids", [])
+    context.user_data["bot_message_ids"] = [sent_message.message_id]
+    if old_message_ids:
+        await delete_messages(context.bot, chat_id, old_message_ids)
 
     return sent_message
 
@@ -91,35 +137,39 @@ async def set_commands(application):
     await application.bot.set_my_commands(commands)
 
 
+@cache
 def get_final_confirm():
     keyboard = [
         [
-            InlineKeyboardButton("تایید نهایی", callback_data="create_subscription_action_confirm:ok")
+            InlineKeyboardButton("تایید نهایی", callback_data=pack("create_subscription_action_confirm", "ok"))
         ],
         [
-            InlineKeyboardButton("بازگشت", callback_data="create_subscription_action_confirm:back")
+            InlineKeyboardButton("بازگشت", callback_data=pack("create_subscription_action_confirm", "back"))
         ]
     ]
     return InlineKeyboardMarkup(keyboard)
 
 
-def is_superuser(update) -> bool:
-    user = update.effective_user
-    user_id = user.id
-    with GetDB() as db:
-        admin_obj = get_admin_by_telegram_id(db, user_id)
-    return admin_obj.is_sudo
+def subscription_price(admin_obj, size):
+    # size comes from the cart and can still be "x"/"back" when an older message's button is tapped
+    size = str(size)
+    if not size.isdigit() or int(size) <= 0:
+        return None
+    return int(size) * admin_obj.hakobot_gb_fee
+
+
+async def is_superuser(update, context) -> bool:
+    admin_obj = getattr(context, "admin", None) or await resolve_admin(update.effective_user.id)
+    return bool(admin_obj and admin_obj.is_sudo)
 
 
 # /start command
 @permission_required(admin=True)
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    user_id = user.id
+    admin_obj = context.admin
 
-    with GetDB() as db:
-        admin_obj = get_admin_by_telegram_id(db, user_id)
-        all_users = crud.get_users_count(db)
+    async with GetAsyncDB() as db:
+        all_users = sum(users_count for users_count, _, _ in (await crud.get_user_counters(db)).values())
 
     now_jalali = jdatetime.datetime.now().strftime("%Y/%m/%d")
 
@@ -134,36 +184,37 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ))
     await send_and_store(update, context,
                          welcome_text,
-                         reply_markup=BotKeyboard.get_main_menu(is_superuser(update)),
+                         reply_markup=BotKeyboard.get_main_menu(await is_superuser(update, context)),
                          )
 
 
-# Handle button clicks
-async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    user_id = query.from_user.id
+callbacks = CallbackRouter()
 
-    await query.answer()
 
-    if query.data.startswith("create_admin"):
-        reply_text = set_watermark((
-            "نام کاربری ادمین را وارد کنید: (حداقل ۵ حرف)\n."
-        ))
-        context.user_data["create_admin_step"] = 1
-        await query.edit_message_text(reply_text, reply_markup=BotKeyboard.cancel())
-        return
+@callbacks.route("create_admin")
+async def create_admin_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    reply_text = set_watermark((
+        "نام کاربری ادمین را وارد کنید: (حداقل ۵ حرف)\n."
+    ))
+    context.user_data["create_admin_step"] = 1
+    await query.edit_message_text(reply_text, reply_markup=BotKeyboard.cancel())
+
 
-    if query.data.startswith("users:"):
-        page = int(query.data.split(":")[1])
-        with GetDB() as db:
-            admin_obj = get_admin_by_telegram_id(db, user_id)
-            if admin_obj.is_sudo:
-                all_users = crud.get_users_count(db)
-            else:
-                all_users = crud.get_users_count(db, admin=admin_obj)
-            total_pages = math.ceil(all_users / 11)
-            users = crud.get_users(db, offset=(page - 1) * 11, limit=11, sort=[crud.UsersSortingOptions["-created_at"]])
-            reply_text = set_watermark("""👥 تعداد کاربران: {all_users}
+@callbacks.route("users")
+async def users_callback(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                         page: int, direction: str, cursor_created_at: int, cursor_id: int):
+    query = update.callback_query
+    admin_obj = await resolve_admin(query.from_user.id)
+    # resellers only page through their own users, sudo admins see the whole panel
+    owner = None if admin_obj.is_sudo else admin_obj
+    all_users = await get_cached_users_count(owner)
+    total_pages = math.ceil(all_users / USERS_PAGE_SIZE)
+    async with GetAsyncDB() as db:
+        users = await crud.get_user_summaries(db, limit=USERS_PAGE_SIZE,
+                                              cursor=(micros_to_datetime(cursor_created_at), cursor_id),
+                                              backward=direction == "p", admin=owner)
+        reply_text = set_watermark("""👥 تعداد کاربران: {all_users}
             
 ✅ فعال
 ❌ غیرفعال
@@ -171,48 +222,69 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🪫 اتمام گیگ
 🔌 متصل نشده
 """.format(page=page, total_pages=total_pages, all_users=all_users))
-        await query.edit_message_text(reply_text, reply_markup=BotKeyboard.show_user_list_menu(users=users, page=page,
-                                                                                               total_pages=total_pages))
-        return
+    await query.edit_message_text(reply_text, reply_markup=BotKeyboard.show_user_list_menu(users=users, page=page,
+                                                                                           total_pages=total_pages))
 
-    if query.data.startswith("create_subscription_action_duration:"):
-        duration = query.data.split(":")[1]
-        context.user_data["buying__selected_duration"] = duration
 
-        if duration == "x":
-            await query.edit_message_text(set_watermark(f"لطفا تعداد ماه دلخواه را وارد کنید (حداکثر 12):\n."))
-            context.user_data["awaiting_create_subscription_action_duration"] = True
-        else:
-            await query.edit_message_text(set_watermark(f"💎 حجم مصرف اشتراک را انتخاب کنید:\n."),
-                                          reply_markup=BotKeyboard.get_the_size_of_packets())
-
-    elif query.data.startswith("create_subscription_action_size:"):
-        size = query.data.split(":")[1]
-        context.user_data["buying__selected_size"] = size
-
-        if size == "back":
-            await query.edit_message_text(set_watermark("⏳ دوره اشتراک را انتخاب کنید:\n."),
-                                          reply_markup=BotKeyboard.get_the_duration_of_packets())
-        elif size == "x":
-            await query.edit_message_text(
-                set_watermark("لطفا حجم دلخواه را به گیگابایت وارد کنید (حداکثر ۲۰۰ گیگ):\n."))
-            context.user_data["awaiting_create_subscription_action_size"] = True
-        else:
-            cart_packet = (
-                f"مشخصات نهایی اشتراک\n"
-                f"دوره اشتراک: {context.user_data['buying__selected_duration']} ماهه\n"
-                f"حجم مصرف: {context.user_data['buying__selected_size']} گیگابایت\n"
-                f"مبلغ سفارش: 12,200 تومان\n"
-            )
-            await query.edit_message_text(set_watermark(cart_packet), reply_markup=get_final_confirm())
+@callbacks.route("create_subscription_action_duration")
+async def subscription_duration_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, duration: str):
+    query = update.callback_query
+    context.user_data["buying__selected_duration"] = duration
 
-    elif query.data.startswith("create_subscription_action_confirm:"):
-        status = query.data.split(":")[1]
-        if status == "ok":
-            await query.edit_message_text('OK', reply_markup=None)
-        else:
-            await query.edit_message_text(set_watermark(f"💎 حجم مصرف اشتراک را انتخاب کنید:\n."),
-                                          reply_markup=BotKeyboard.get_the_size_of_packets())
+    if duration == "x":
+        await query.edit_message_text(set_watermark(f"لطفا تعداد ماه دلخواه را وارد کنید (حداکثر 12):\n."))
+        context.user_data["awaiting_create_subscription_action_duration"] = True
+    else:
+        await query.edit_message_text(set_watermark(f"💎 حجم مصرف اشتراک را انتخاب کنید:\n."),
+                                      reply_markup=BotKeyboard.get_the_size_of_packets())
+
+
+@callbacks.route("create_subscription_action_size")
+async def subscription_size_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, size: str):
+    query = update.callback_query
+    context.user_data["buying__selected_size"] = size
+
+    if size == "back":
+        await query.edit_message_text(set_watermark("⏳ دوره اشتراک را انتخاب کنید:\n."),
+                                      reply_markup=BotKeyboard.get_the_duration_of_packets())
+    elif size == "x":
+        await query.edit_message_text(
+            set_watermark("لطفا حجم دلخواه را به گیگابایت وارد کنید (حداکثر ۲۰۰ گیگ):\n."))
+        context.user_data["awaiting_create_subscription_action_size"] = True
+    else:
+        admin_obj = await resolve_admin(query.from_user.id)
+        price = subscription_price(admin_obj, size)
+        if price is None:
+            await query.edit_message_text(set_watermark("⚠️ سفارش منقضی شده است، دوباره تلاش کنید.\n."),
+                                          reply_markup=None)
+            return
+        cart_packet = (
+            f"مشخصات نهایی اشتراک\n"
+            f"دوره اشتراک: {context.user_data['buying__selected_duration']} ماهه\n"
+            f"حجم مصرف: {context.user_data['buying__selected_size']} گیگابایت\n"
+            f"مبلغ سفارش: {price:,} تومان\n"
+        )
+        await query.edit_message_text(set_watermark(cart_packet), reply_markup=get_final_confirm())
+
+
+@callbacks.route("create_subscription_action_confirm")
+async def subscription_confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, status: str):
+    query = update.callback_query
+    if status == "ok":
+        admin_obj = await resolve_admin(query.from_user.id)
+        size = context.user_data.get("buying__selected_size")
+        if not admin_obj or subscription_price(admin_obj, size) is None:
+            await query.edit_message_text(set_watermark("⚠️ سفارش منقضی شده است، دوباره تلاش کنید.\n."),
+                                          reply_markup=None)
+            return
+
+        # nothing is provisioned here yet, the wallet is only debited (wallet.debit, which doesn't commit)
+        # inside wallet_session together with the subscription it pays for, so both are committed at once
+        # and the cached balance is dropped afterwards
+        await query.edit_message_text('OK', reply_markup=None)
+    else:
+        await query.edit_message_text(set_watermark(f"💎 حجم مصرف اشتراک را انتخاب کنید:\n."),
+                                      reply_markup=BotKeyboard.get_the_size_of_packets())
 
 
 async def create_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -220,33 +292,65 @@ async def create_subscription(update: Update, context: ContextTypes.DEFAULT_TYPE
                                            reply_markup=BotKeyboard.get_the_duration_of_packets())
 
 
-async def handle_payment_review_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@callbacks.route("approve")
+async def approve_payment_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
     query: CallbackQuery = update.callback_query
-    await query.answer()  # بستن لودینگ دکمه
+    # balance is about to change, drop the cached admin record
+    invalidate_admin(user_id)
+    await query.edit_message_caption(
+        caption="✅ رسید پرداخت تأیید شد.\nبا تشکر از شما!",
+        reply_markup=None
+    )
+    # ارسال پیام خاص به بات یا کاربر
+    await context.bot.send_message(chat_id=user_id, text="🎉 پرداخت شما تأیید شد.")
 
-    data = query.data
-    action, user_id = data.split(":")
 
-    if action == "approve":
-        await query.edit_message_caption(
-            caption="✅ رسید پرداخت تأیید شد.\nبا تشکر از شما!",
-            reply_markup=None
-        )
-        # ارسال پیام خاص به بات یا کاربر
-        await context.bot.send_message(chat_id=user_id, text="🎉 پرداخت شما تأیید شد.")
-    elif action == "reject":
-        await query.edit_message_caption(
-            caption="❌ رسید پرداخت رد شد.",
-            reply_markup=None
-        )
-        await context.bot.send_message(chat_id=user_id, text="⛔ پرداخت شما تأیید نشد. لطفاً دوباره تلاش کنید.")
+@callbacks.route("reject")
+async def reject_payment_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int):
+    query: CallbackQuery = update.callback_query
+    await query.edit_message_caption(
+        caption="❌ رسید پرداخت رد شد.",
+        reply_markup=None
+    )
+    await context.bot.send_message(chat_id=user_id, text="⛔ پرداخت شما تأیید نشد. لطفاً دوباره تلاش کنید.")
+
+
+@callbacks.route("transactions")
+async def transactions_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, before_id: int):
+    query: CallbackQuery = update.callback_query
+    admin_obj = await resolve_admin(query.from_user.id)
+    if not admin_obj:
+        return
+
+    async with GetAsyncDB() as db:
+        # one extra row tells whether an older page exists
+        entries = await wallet.get_balance_history(db, admin_obj.id, limit=TRANSACTIONS_PAGE_SIZE + 1,
+                                                   before_id=before_id or None)
+    if not entries:
+        await query.edit_message_text(set_watermark("📜 تراکنشی ثبت نشده است.\n."), reply_markup=None)
+        return
+
+    more = entries[TRANSACTIONS_PAGE_SIZE - 1].id if len(entries) > TRANSACTIONS_PAGE_SIZE else None
+    entries = entries[:TRANSACTIONS_PAGE_SIZE]
+    lines = [
+        f"{'➕' if entry.payment_type == PaymentType.DEPOSIT else '➖'} {entry.amount:,} تومان"
+        f" | {jdatetime.datetime.fromgregorian(datetime=entry.timestamp).strftime('%Y/%m/%d %H:%M')}"
+        f" | مانده: {entry.balance_after:,}"
+        for entry in entries
+    ]
+    await query.edit_message_text(set_watermark("📜 لیست تراکنش‌ها:\n\n" + "\n".join(lines) + "\n."),
+                                  reply_markup=BotKeyboard.transactions_menu(more))
+
+
+async def unhandled_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # stop the loading spinner of buttons that have no action yet
+    await update.callback_query.answer()
 
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # if context.user_data.get("awaiting_send_image"):
     user = update.effective_user
-    with GetDB() as db:
-        admin_obj = get_admin_by_telegram_id(db, user.id)
+    admin_obj = await resolve_admin(user.id)
     photo = update.message.photo[-1]  # بهترین کیفیت
 
     caption = (
@@ -258,8 +362,8 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     keyboard = InlineKeyboardMarkup([
         [
-            InlineKeyboardButton("✅ تأیید", callback_data=f"approve:{user.id}"),
-            InlineKeyboardButton("❌ رد", callback_data=f"reject:{user.id}")
+            InlineKeyboardButton("✅ تأیید", callback_data=pack("approve", user.id)),
+            InlineKeyboardButton("❌ رد", callback_data=pack("reject", user.id))
         ]
     ])
 
@@ -277,6 +381,9 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # Catch all text messages
 @permission_required(admin=True)
 async def all_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # photos, stickers, edits... have no text to answer a step or search users with
+    if not update.message or not update.message.text:
+        return
     text = update.message.text
 
     if context.user_data.get("create_admin_step"):
@@ -313,7 +420,7 @@ async def all_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     if context.user_data.get("awaiting_create_subscription_action_size"):
-        if text.isdigit():
+        if text.isdigit() and int(text) > 0:
             context.user_data["awaiting_create_subscription_action_size"] = False
             size = int(text)
             context.user_data["buying__selected_size"] = size
@@ -321,7 +428,7 @@ async def all_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 f"مشخصات نهایی اشتراک\n"
                 f"دوره اشتراک: {context.user_data['buying__selected_duration']} ماهه\n"
                 f"حجم مصرف: {context.user_data['buying__selected_size']} گیگابایت\n"
-                f"مبلغ سفارش: 12,200 تومان\n"
+                f"مبلغ سفارش: {subscription_price(context.admin, size):,} تومان\n"
             )
             await update.message.reply_text(cart_packet, reply_markup=get_final_confirm())
         else:
@@ -335,9 +442,10 @@ async def all_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     elif text == "👥 مدیریت کاربران":
         page = 1
-        with GetDB() as db:
-            total_pages = math.ceil(crud.get_users_count(db) / 11)
-            users = crud.get_users(db, offset=(page - 1) * 11, limit=11, sort=[crud.UsersSortingOptions["-created_at"]])
+        owner = None if context.admin.is_sudo else context.admin
+        total_pages = math.ceil(await get_cached_users_count(owner) / USERS_PAGE_SIZE)
+        async with GetAsyncDB() as db:
+            users = await crud.get_user_summaries(db, limit=USERS_PAGE_SIZE, admin=owner)
 
         await update.message.reply_text(set_watermark((
             f"یک کاربر را انتخاب کنید:\n."
@@ -345,9 +453,7 @@ async def all_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     elif text == "💰 کیف پول من":
-        user_id = update.message.from_user.id
-        with GetDB() as db:
-            admin_obj = get_admin_by_telegram_id(db, user_id)
+        admin_obj = context.admin
         reply_text = set_watermark((
             f"موجودی:\n"
             f"{admin_obj.hakobot_balance:,} تومان\n"
@@ -372,20 +478,46 @@ async def all_messages(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(admin_status_data, reply_markup=BotKeyboard.admins_management_menu())
         return
 
-    await update.message.reply_text(f"جستجوی کاربر: {text}", reply_markup=None)
+    owner = None if context.admin.is_sudo else context.admin
+    async with GetAsyncDB() as db:
+        users = await crud.search_users(db, text, limit=SEARCH_RESULTS_LIMIT, admin=owner)
 
+    if not users:
+        await update.message.reply_text(set_watermark(f"❌ کاربری برای «{text}» یافت نشد.\n."), reply_markup=None)
+        return
 
-# Main entry point
-def main():
-    # import asyncio
+    await update.message.reply_text(set_watermark(f"جستجوی کاربر: {text}\n."),
+                                    reply_markup=BotKeyboard.show_user_list_menu(users=users, page=1, total_pages=1))
 
-    app = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+
+def build_application(updater: bool = True) -> Application:
+    builder = Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(start_jobs)
+    if CONCURRENT_UPDATES > 1:
+        builder = builder.concurrent_updates(PerChatUpdateProcessor(CONCURRENT_UPDATES))
+    if not updater:
+        # updates are pushed into app.update_queue by the webhook server
+        builder = builder.updater(None)
+    app = builder.build()
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("create_subscription", create_subscription))
     app.add_handler(MessageHandler(filters.PHOTO, handle_photo))
-    app.add_handler(CallbackQueryHandler(button_handler))
-    app.add_handler(CallbackQueryHandler(handle_payment_review_callback))
+    app.add_handler(callbacks.handler())
+    app.add_handler(CallbackQueryHandler(unhandled_callback))
     app.add_handler(MessageHandler(filters.ALL, all_messages))  # Capture any message
+    return app
+
+
+# Main entry point
+def main():
+    # import asyncio
+
+    if WEBHOOK_URL:
+        app = build_application(updater=False)
+        print("🤖 Bot is running (webhook)...")
+        run_webhook(app, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN, WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH)
+        return
+
+    app = build_application()
 
     # asyncio.run(set_commands(app))
     print("🤖 Bot is running...")
@@ -0,0 +1,53 @@
+import re
+from typing import Callable, Dict
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, ContextTypes
+
+from callback_data import ACTIONS, CALLBACK_DATA_VERSION, SEPARATOR, unpack
+
+
+class CallbackRouter:
+    """
+    Maps callback actions (see callback_data.ACTIONS) to handlers.
+
+    The router unpacks callback_data with the action's schema before calling
+    `handler(update, context, *args)`. Dispatch is a single dict lookup, so it stays
+    flat however many menu actions are registered.
+    """
+
+    def __init__(self):
+        self._routes: Dict[str, Callable] = {}
+
+    def route(self, name: str):
+        if name not in ACTIONS:
+            raise ValueError(f"callback action has no schema in callback_data.ACTIONS: {name}")
+        if name in self._routes:
+            raise ValueError(f"callback action already registered: {name}")
+
+        def decorator(func):
+            self._routes[name] = func
+            return func
+
+        return decorator
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        await query.answer()
+
+        try:
+            name, args = unpack(query.data)
+        except ValueError as e:
+            print(f"❗️callback نامعتبر {query.data!r}: {e}")
+            return
+
+        return await self._routes[name](update, context, *args)
+
+    @property
+    def pattern(self) -> re.Pattern:
+        codes = "".join(re.escape(ACTIONS[name].code) for name in self._routes)
+        return re.compile(rf"^{re.escape(CALLBACK_DATA_VERSION)}[{codes}](?:{re.escape(SEPARATOR)}|$)")
+
+    def handler(self) -> CallbackQueryHandler:
+        """A CallbackQueryHandler that only accepts registered actions."""
+        return CallbackQueryHandler(self.dispatch, pattern=self.pattern)
@@ -0,0 +1,88 @@
+import hmac
+from contextlib import asynccontextmanager
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+from config import (
+    UVICORN_HOST,
+    UVICORN_PORT,
+    UVICORN_SSL_CERTFILE,
+    UVICORN_SSL_KEYFILE,
+    UVICORN_UDS,
+)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_webhook_app(application: Application, path: str, secret_token: str,
+                       webhook_url: str = None) -> Starlette:
+    """
+    Builds an ASGI app that receives Telegram updates on `path` and pushes them into
+    the Application's update queue. When `webhook_url` is given it is registered with
+    Telegram on startup.
+    """
+
+    async def telegram_webhook(request: Request) -> Response:
+        token = request.headers.get(SECRET_TOKEN_HEADER, "")
+        # bytes, compare_digest raises TypeError on non-ASCII str
+        if not hmac.compare_digest(token.encode(), secret_token.encode()):
+            return Response(status_code=403)
+
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception:
+            return Response(status_code=400)
+
+        await application.update_queue.put(update)
+        return Response(status_code=200)
+
+    @asynccontextmanager
+    async def lifespan(_):
+        # same order as Application.run_polling/run_webhook, which aren't used here
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        if webhook_url:
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        try:
+            yield
+        finally:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+
+    return Starlette(
+        routes=[Route(path, telegram_webhook, methods=["POST"])],
+        lifespan=lifespan,
+    )
+
+
+def run_webhook(application: Application, path: str, secret_token: str, webhook_url: str = None):
+    app = create_webhook_app(application, path, secret_token, webhook_url)
+
+    bind_args = {}
+    if UVICORN_UDS:
+        bind_args["uds"] = UVICORN_UDS
+    else:
+        bind_args["host"] = UVICORN_HOST
+        bind_args["port"] = UVICORN_PORT
+
+    if UVICORN_SSL_CERTFILE and UVICORN_SSL_KEYFILE:
+        bind_args["ssl_certfile"] = UVICORN_SSL_CERTFILE
+        bind_args["ssl_keyfile"] = UVICORN_SSL_KEYFILE
+
+    uvicorn.run(app, workers=1, **bind_args)
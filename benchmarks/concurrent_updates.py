@@ -0,0 +1,67 @@
+"""
+Replays updates from N simulated admins against a fake Bot whose API calls
+sleep for a fixed latency, once with sequential processing and once with
+PerChatUpdateProcessor, and prints the throughput of both.
+
+Usage: python benchmarks/concurrent_updates.py [admins] [updates_per_admin] [concurrency]
+"""
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "admin_bots"))
+
+from telegram.ext import SimpleUpdateProcessor  # noqa: E402
+
+from concurrency import PerChatUpdateProcessor  # noqa: E402
+
+API_LATENCY = 0.05  # seconds per Bot API call
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = {}
+
+    async def send_message(self, chat_id, text):
+        await asyncio.sleep(API_LATENCY)
+        self.sent.setdefault(chat_id, []).append(text)
+
+
+async def handle(bot: FakeBot, update):
+    # one delete + one send, like send_and_store
+    await asyncio.sleep(API_LATENCY)
+    await bot.send_message(update.effective_chat.id, update.text)
+
+
+async def replay(processor, admins: int, per_admin: int) -> float:
+    bot = FakeBot()
+    updates = [
+        SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), effective_user=None, text=str(seq))
+        for seq in range(per_admin) for chat_id in range(admins)
+    ]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(processor.process_update(u, handle(bot, u)) for u in updates))
+    elapsed = time.perf_counter() - start
+
+    for chat_id, texts in bot.sent.items():
+        assert texts == [str(i) for i in range(per_admin)], f"chat {chat_id} processed out of order"
+    return elapsed
+
+
+async def main(admins: int, per_admin: int, concurrency: int):
+    total = admins * per_admin
+    sequential = await replay(SimpleUpdateProcessor(1), admins, per_admin)
+    per_chat = await replay(PerChatUpdateProcessor(concurrency), admins, per_admin)
+
+    print(f"{total} updates from {admins} admins, {API_LATENCY * 1000:.0f}ms per API call")
+    print(f"sequential : {sequential:7.2f}s  {total / sequential:8.1f} updates/s")
+    print(f"per-chat   : {per_chat:7.2f}s  {total / per_chat:8.1f} updates/s  (concurrency={concurrency})")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    admins, per_admin, concurrency = (args + [50, 5, 32][len(args):])[:3]
+    asyncio.run(main(admins, per_admin, concurrency))
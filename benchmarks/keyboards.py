@@ -0,0 +1,57 @@
+"""
+Measures allocations and time per update for the static BotKeyboard menus,
+rebuilding them on every call (the uncached `__wrapped__` functions) versus
+reusing the memoized instances.
+
+Usage: python benchmarks/keyboards.py [iterations]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "admin_bots"))
+
+from keyboards import BotKeyboard  # noqa: E402
+
+# keyboards a typical update builds: main menu plus the subscription flow
+CALLS = (
+    ("get_main_menu", (True,)),
+    ("get_main_menu", (False,)),
+    ("get_the_duration_of_packets", ()),
+    ("get_the_size_of_packets", ()),
+    ("cancel", ()),
+)
+
+
+def build_all(cached: bool):
+    keyboards = []
+    for name, args in CALLS:
+        func = getattr(BotKeyboard, name)
+        keyboards.append((func if cached else func.__wrapped__)(*args))
+    return keyboards
+
+
+def measure(cached: bool, iterations: int):
+    build_all(cached)  # warm up the caches
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    keyboards = build_all(cached)  # kept alive so its allocations show up in the snapshot
+    after = tracemalloc.take_snapshot()
+    del keyboards
+    tracemalloc.stop()
+    allocations = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        build_all(cached)
+    per_update = (time.perf_counter() - start) / iterations
+    return allocations, per_update
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for label, cached in (("rebuilt", False), ("memoized", True)):
+        allocations, per_update = measure(cached, iterations)
+        print(f"{label:9}: {allocations:6} allocations/update  {per_update * 1e6:8.2f}µs/update")
@@ -0,0 +1,61 @@
+"""
+POSTs synthetic message updates to a running webhook server and reports the
+request rate and latency percentiles.
+
+Usage: python benchmarks/webhook_load.py <url> <secret_token> [requests] [parallel]
+e.g.   python benchmarks/webhook_load.py http://127.0.0.1:8000/telegram s3cret 2000 50
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+
+def synthetic_update(update_id: int) -> dict:
+    chat_id = 100000 + update_id % 500
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": f"load{chat_id}"},
+            "text": "/start",
+        },
+    }
+
+
+async def main(url: str, secret_token: str, total: int, parallel: int):
+    latencies = []
+    statuses = {}
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+
+    async def worker(client: httpx.AsyncClient):
+        while not queue.empty():
+            update_id = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post(url, json=synthetic_update(update_id),
+                                         headers={"X-Telegram-Bot-Api-Secret-Token": secret_token})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(timeout=30) as client:
+        await asyncio.gather(*(worker(client) for _ in range(parallel)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{total} updates in {elapsed:.2f}s -> {total / elapsed:.1f} req/s, statuses: {statuses}")
+    for p in (50, 90, 99):
+        print(f"p{p}: {latencies[min(len(latencies) - 1, len(latencies) * p // 100)] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit(__doc__)
+    asyncio.run(main(sys.argv[1], sys.argv[2],
+                     int(sys.argv[3]) if len(sys.argv) > 3 else 1000,
+                     int(sys.argv[4]) if len(sys.argv) > 4 else 20))
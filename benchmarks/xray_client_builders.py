@@ -0,0 +1,35 @@
+"""
+Times XRayConfig.include_users, with the per-inbound flow flag and client builders, on inbounds
+covering every network / security / header combination. The generated clients are checked
+against a golden file by tests/test_xray_client_builders.py, which shares these fixtures.
+
+Usage: python benchmarks/xray_client_builders.py [users]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dep.xray.config import XRayConfig  # noqa: E402
+from tests.xray_fixtures import combinations_config, user_rows  # noqa: E402
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    config = XRayConfig(combinations_config())
+    rows = user_rows(users)
+
+    generated, elapsed = timed(config.include_users, rows)
+    clients = sum(len(inbound.get('settings', {}).get('clients', ())) for inbound in generated['inbounds'])
+
+    flow_inbounds = [inbound['tag'] for inbound in config.inbounds if inbound['flow_allowed']]
+    print(f"{len(config.inbounds)} inbounds ({', '.join(flow_inbounds)} allow flow), {users} users:"
+          f" {clients} clients")
+    print(f"client builders {elapsed * 1e3:8.1f}ms")
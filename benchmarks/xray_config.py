@@ -0,0 +1,93 @@
+"""
+Compares a full XRayConfig.include_users rebuild with applying user deltas
+to a ClientIndex, on a synthetic config and synthetic users (no database).
+
+Usage: python benchmarks/xray_config.py [users ...]
+"""
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dep.xray.clients import ClientIndex  # noqa: E402
+from dep.xray.config import XRayConfig  # noqa: E402
+
+CHANGED_PERCENT = 1  # share of users modified between two emits
+
+
+def base_config(inbounds_per_protocol: int = 2) -> dict:
+    inbounds = []
+    for i in range(inbounds_per_protocol):
+        inbounds += [
+            {
+                "tag": f"VLESS_REALITY_{i}", "port": 2000 + i, "protocol": "vless",
+                "settings": {"clients": [], "decryption": "none"},
+                "streamSettings": {
+                    "network": "tcp", "security": "reality",
+                    "realitySettings": {"serverNames": ["example.com"], "publicKey": "pbk", "shortIds": ["abcd"]},
+                },
+            },
+            {
+                "tag": f"VMESS_WS_{i}", "port": 3000 + i, "protocol": "vmess",
+                "settings": {"clients": []},
+                "streamSettings": {"network": "ws", "wsSettings": {"path": "/ws"}},
+            },
+            {
+                "tag": f"TROJAN_TCP_{i}", "port": 4000 + i, "protocol": "trojan",
+                "settings": {"clients": []},
+                "streamSettings": {"network": "tcp"},
+            },
+        ]
+    return {
+        "inbounds": inbounds,
+        "outbounds": [{"protocol": "freedom", "tag": "DIRECT"}, {"protocol": "blackhole", "tag": "BLOCK"}],
+        "routing": {"rules": []},
+    }
+
+
+def user_rows(user_id: int) -> list:
+    username = f"user{user_id}"
+    return [
+        (user_id, username, "vless", {"id": str(uuid.uuid4()), "flow": "xtls-rprx-vision"}, None),
+        (user_id, username, "vmess", {"id": str(uuid.uuid4())}, None),
+        (user_id, username, "trojan", {"password": uuid.uuid4().hex}, ["TROJAN_TCP_1"]),
+    ]
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def run(users: int):
+    config = XRayConfig(base_config())
+    rows = [row for user_id in range(1, users + 1) for row in user_rows(user_id)]
+    changed = max(1, users * CHANGED_PERCENT // 100)
+
+    _, full = timed(config.include_users, rows)
+
+    index = ClientIndex(config)
+    _, load = timed(index.load, rows)
+
+    def apply_changes():
+        for user_id in range(1, changed + 1):
+            index.apply(user_id, user_rows(user_id))
+
+    _, delta = timed(apply_changes)
+    _, emit = timed(index.config)
+    _, cached = timed(index.config)
+
+    print(f"{users:>7} users, {changed} changed:"
+          f"  full rebuild {full * 1e3:9.1f}ms"
+          f"  | index load {load * 1e3:9.1f}ms"
+          f"  delta apply {delta * 1e3:8.1f}ms"
+          f"  emit {emit * 1e3:9.1f}ms"
+          f"  emit unchanged {cached * 1e6:6.1f}µs")
+
+
+if __name__ == "__main__":
+    for users in map(int, sys.argv[1:] or [10000, 100000]):
+        run(users)
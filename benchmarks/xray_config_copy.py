@@ -0,0 +1,68 @@
+"""
+Measures time and retained memory per copy of a large XRayConfig, comparing
+copy() (deepcopy) with clients_copy() (structural sharing), on a synthetic
+config with hundreds of inbounds, outbounds and routing rules.
+
+Usage: python benchmarks/xray_config_copy.py [inbounds] [copies]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dep.xray.config import XRayConfig  # noqa: E402
+
+# stands in for inline TLS certificates and other bulky strings copied along with the config
+BLOB = "MIIB" + "A" * 4096
+
+
+def large_config(inbounds: int) -> dict:
+    config = {"inbounds": [], "outbounds": [], "routing": {"rules": []}}
+    for i in range(inbounds):
+        if i % 2:
+            config["inbounds"].append({
+                "tag": f"VMESS_WS_{i}", "port": 10000 + i, "protocol": "vmess",
+                "settings": {"clients": []},
+                "streamSettings": {"network": "ws", "wsSettings": {"path": f"/ws{i}", "headers": {"X-Blob": BLOB}}},
+            })
+        else:
+            config["inbounds"].append({
+                "tag": f"VLESS_REALITY_{i}", "port": 10000 + i, "protocol": "vless",
+                "settings": {"clients": [], "decryption": "none"},
+                "streamSettings": {
+                    "network": "tcp", "security": "reality",
+                    "realitySettings": {"serverNames": [f"s{i}.example.com"], "publicKey": BLOB, "shortIds": ["ab"]},
+                },
+            })
+        config["outbounds"].append({"tag": f"OUT_{i}", "protocol": "freedom", "settings": {"note": BLOB}})
+        config["routing"]["rules"].append({
+            "type": "field", "inboundTag": [config["inbounds"][-1]["tag"]], "outboundTag": f"OUT_{i}",
+            "domain": [f"domain:{i}-{j}.example.com" for j in range(50)],
+        })
+    return config
+
+
+def measure(copy, copies: int):
+    started = time.perf_counter()
+    for _ in range(copies):
+        copy()
+    per_copy = (time.perf_counter() - started) / copies
+
+    tracemalloc.start()
+    kept = [copy() for _ in range(copies)]  # kept alive so what each copy allocates stays in the count
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return per_copy, retained / copies
+
+
+if __name__ == "__main__":
+    inbounds = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    copies = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    config = XRayConfig(large_config(inbounds))
+    print(f"{inbounds} inbounds, config json {len(config.to_json()) / 1024 / 1024:.1f}MiB")
+    for label, copy in (("deepcopy", config.copy), ("clients_copy", config.clients_copy)):
+        per_copy, retained = measure(copy, copies)
+        print(f"{label:13}: {per_copy * 1e3:8.2f}ms/copy  {retained / 1024:10.1f}KiB retained/copy")
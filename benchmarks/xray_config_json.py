@@ -0,0 +1,85 @@
+"""
+Compares to_json (json.dumps of the whole config) with the streaming XRayConfig.dump on a
+synthetic config with many clients: wall time and peak traced memory while writing the file.
+Both outputs are checked to decode to the same document, and without orjson the streamed
+bytes must equal json.dumps.
+
+Usage: python benchmarks/xray_config_json.py [users ...]
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.xray_config import base_config, user_rows  # noqa: E402
+from dep.xray import encoder  # noqa: E402
+from dep.xray.config import XRayConfig  # noqa: E402
+
+
+def measure(write):
+    path = os.path.join(tempfile.mkdtemp(), 'config.json')
+    started = time.perf_counter()
+    write(path)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    write(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with open(path, 'rb') as f:
+        data = f.read()
+    os.remove(path)
+    return elapsed, peak, data
+
+
+def to_json(config, indent):
+    def write(path):
+        with open(path, 'w') as f:
+            f.write(config.to_json(indent=indent))
+    return write
+
+
+def dump(config, indent):
+    def write(path):
+        with open(path, 'wb') as f:
+            config.dump(f, indent=indent)
+    return write
+
+
+def check_identical_without_orjson(config):
+    fast, encoder.orjson = encoder.orjson, None
+    try:
+        for indent in (None, 2, 4):
+            stream = io.BytesIO()
+            config.dump(stream, indent=indent)
+            assert stream.getvalue() == config.to_json(indent=indent).encode(), f"indent={indent} differs"
+    finally:
+        encoder.orjson = fast
+
+
+def run(users: int):
+    rows = [row for user_id in range(1, users + 1) for row in user_rows(user_id)]
+    config = XRayConfig(base_config()).include_users(rows)
+    check_identical_without_orjson(config)
+
+    print(f"{users:>7} users, orjson {'on' if encoder.orjson else 'off'}:")
+    for indent in (None, 2, 4):
+        reference = None
+        for label, write in (("to_json", to_json(config, indent)), ("dump", dump(config, indent))):
+            elapsed, peak, data = measure(write)
+            if reference is None:
+                reference = json.loads(data)
+            else:
+                assert json.loads(data) == reference, "streamed config differs"
+            print(f"  indent={indent!s:4} {label:8}: {elapsed * 1e3:8.1f}ms"
+                  f"  peak {peak / 1024 / 1024:8.1f}MiB  file {len(data) / 1024 / 1024:7.1f}MiB")
+
+
+if __name__ == "__main__":
+    for users in map(int, sys.argv[1:] or [10000, 100000]):
+        run(users)
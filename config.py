@@ -146,3 +146,19 @@ JOB_RECORD_NODE_USAGES_INTERVAL = config("JOB_RECORD_NODE_USAGES_INTERVAL", cast
 JOB_RECORD_USER_USAGES_INTERVAL = config("JOB_RECORD_USER_USAGES_INTERVAL", cast=int, default=10)
 JOB_REVIEW_USERS_INTERVAL = config("JOB_REVIEW_USERS_INTERVAL", cast=int, default=10)
 JOB_SEND_NOTIFICATIONS_INTERVAL = config("JOB_SEND_NOTIFICATIONS_INTERVAL", cast=int, default=30)
+JOB_RECONCILE_USER_COUNTERS_INTERVAL = config("JOB_RECONCILE_USER_COUNTERS_INTERVAL", cast=int, default=600)
+JOB_BALANCE_SNAPSHOTS_INTERVAL = config("JOB_BALANCE_SNAPSHOTS_INTERVAL", cast=int, default=24 * 60 * 60)
+# daily balance snapshots older than this are dropped, the monthly ones are kept
+BALANCE_SNAPSHOTS_DAILY_RETENTION_DAYS = config("BALANCE_SNAPSHOTS_DAILY_RETENTION_DAYS", cast=int, default=90)
+
+# admin bot, cache of admin records keyed by telegram id
+ADMIN_CACHE_TTL = config("ADMIN_CACHE_TTL", cast=int, default=30)
+ADMIN_CACHE_MAX_SIZE = config("ADMIN_CACHE_MAX_SIZE", cast=int, default=1024)
+# seconds a user count shown in the paginated user list is reused before COUNT(*) runs again
+USERS_COUNT_CACHE_TTL = config("USERS_COUNT_CACHE_TTL", cast=int, default=60)
+
+# audit files of bulk operations: tsv, csv or ndjson, optionally gzipped, kept in memory up to
+# AUDIT_EXPORT_MAX_MEMORY bytes before spilling to a temporary file
+AUDIT_EXPORT_FORMAT = config("AUDIT_EXPORT_FORMAT", default="tsv").lower()
+AUDIT_EXPORT_GZIP = config("AUDIT_EXPORT_GZIP", cast=bool, default=False)
+AUDIT_EXPORT_MAX_MEMORY = config("AUDIT_EXPORT_MAX_MEMORY", cast=int, default=1024 * 1024)
@@ -1,5 +1,5 @@
 from sqlalchemy.exc import SQLAlchemyError
-from .base import Base, SessionLocal, engine
+from .base import Base, SessionLocal, AsyncSessionLocal, engine, async_engine
 
 class GetDB:  # Context Manager
     def __init__(self):
@@ -12,4 +12,21 @@ class GetDB:  # Context Manager
         if isinstance(exc_value, SQLAlchemyError):
             self.db.rollback()  # rollback on exception
 
-        self.db.close()
\ No newline at end of file
+        self.db.close()
+
+
+class GetAsyncDB:  # Async Context Manager
+    def __init__(self):
+        self.db = AsyncSessionLocal()
+
+    async def __aenter__(self):
+        return self.db
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if isinstance(exc_value, SQLAlchemyError):
+            await self.db.rollback()  # rollback on exception
+
+        await self.db.close()
+
+
+from . import counters  # noqa: F401, registers the user counters flush hook
@@ -0,0 +1,358 @@
+"""
+Async counterparts of the helpers in dep/db/crud.py.
+
+They take an AsyncSession (see GetAsyncDB) so that the telegram handlers can
+await database work instead of blocking the event loop.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import and_, delete, func, insert, or_, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql import Select
+
+from dep.db.base import IS_SQLITE
+from dep.db.crud import USER_SUMMARY_COLUMNS, UserSummary, UsersSortingOptions
+from dep.db.models import System, Admin, User, UserCounter
+from dep.models.user import UserStatus, UserDataLimitResetStrategy
+
+
+async def get_system_usage(db: AsyncSession) -> System:
+    """
+    Retrieves system usage information.
+
+    Args:
+        db (AsyncSession): Async database session.
+
+    Returns:
+        System: System usage information.
+    """
+    return await db.scalar(select(System).limit(1))
+
+
+async def get_users_count(db: AsyncSession, status: UserStatus = None, admin: Admin = None) -> int:
+    """
+    Retrieves the count of users based on status and admin filters.
+
+    Args:
+        db (AsyncSession): Async database session.
+        status (UserStatus, optional): Status to filter users by.
+        admin (Admin, optional): Admin to filter users by.
+
+    Returns:
+        int: Count of users matching the criteria.
+    """
+    stmt = select(func.count(User.id))
+    if admin:
+        stmt = stmt.where(User.admin_id == admin.id)
+    if status:
+        stmt = stmt.where(User.status == status)
+    return await db.scalar(stmt)
+
+
+async def count_users_by_status(db: AsyncSession, admin: Admin = None) -> Dict[UserStatus, int]:
+    """
+    Retrieves the number of users in every status with a single GROUP BY query.
+
+    Args:
+        db (AsyncSession): Async database session.
+        admin (Admin, optional): Admin to filter users by.
+
+    Returns:
+        Dict[UserStatus, int]: Count per status, statuses without users are 0.
+    """
+    stmt = select(User.status, func.count(User.id))
+    if admin:
+        stmt = stmt.where(User.admin_id == admin.id)
+    counts = dict.fromkeys(UserStatus, 0)
+    counts.update((await db.execute(stmt.group_by(User.status))).all())
+    return counts
+
+
+async def get_admin_by_telegram_id(db: AsyncSession, telegram_id: int) -> Admin:
+    """
+    Retrieves an admin by their Telegram ID.
+
+    Args:
+        db (AsyncSession): Async database session.
+        telegram_id (int): The Telegram ID of the admin.
+
+    Returns:
+        Admin: The admin object.
+    """
+    return await db.scalar(select(Admin).where(Admin.telegram_id == telegram_id).limit(1))
+
+
+def get_user_queryset() -> Select:
+    """
+    Retrieves the base user select statement with joined admin details.
+
+    Returns:
+        Select: Base user statement.
+    """
+    return select(User).options(joinedload(User.admin)).options(joinedload(User.next_plan))
+
+
+async def get_users(db: AsyncSession,
+                    offset: Optional[int] = None,
+                    limit: Optional[int] = None,
+                    usernames: Optional[List[str]] = None,
+                    search: Optional[str] = None,
+                    sort: Optional[List[UsersSortingOptions]] = None,
+                    status: Optional[Union[UserStatus, list]] = None,
+                    admin: Optional[Admin] = None,
+                    admins: Optional[List[str]] = None,
+                    reset_strategy: Optional[Union[UserDataLimitResetStrategy, list]] = None,
+                    return_with_count: bool = False) -> Union[List[User], Tuple[List[User], int]]:
+    """
+    Retrieves users based on various filters and options.
+
+    Args:
+        db (AsyncSession): Async database session.
+        offset (Optional[int]): Number of records to skip.
+        limit (Optional[int]): Number of records to retrieve.
+        usernames (Optional[List[str]]): List of usernames to filter by.
+        search (Optional[str]): Search term to filter by username or note.
+        status (Optional[Union[UserStatus, list]]): User status or list of statuses to filter by.
+        sort (Optional[List[UsersSortingOptions]]): Sorting options.
+        admin (Optional[Admin]): Admin to filter users by.
+        admins (Optional[List[str]]): List of admin usernames to filter users by.
+        reset_strategy (Optional[Union[UserDataLimitResetStrategy, list]]): Data limit reset strategy to filter by.
+        return_with_count (bool): Whether to return the total count of users.
+
+    Returns:
+        Union[List[User], Tuple[List[User], int]]: List of users or tuple of users and total count.
+    """
+    stmt = get_user_queryset()
+
+    if search:
+        stmt = stmt.where(or_(User.username.ilike(f"%{search}%"), User.note.ilike(f"%{search}%")))
+
+    if usernames:
+        stmt = stmt.where(User.username.in_(usernames))
+
+    if status:
+        if isinstance(status, list):
+            stmt = stmt.where(User.status.in_(status))
+        else:
+            stmt = stmt.where(User.status == status)
+
+    if reset_strategy:
+        if isinstance(reset_strategy, list):
+            stmt = stmt.where(User.data_limit_reset_strategy.in_(reset_strategy))
+        else:
+            stmt = stmt.where(User.data_limit_reset_strategy == reset_strategy)
+
+    if admin:
+        stmt = stmt.where(User.admin_id == admin.id)
+
+    if admins:
+        stmt = stmt.where(User.admin.has(Admin.username.in_(admins)))
+
+    if return_with_count:
+        count = await db.scalar(select(func.count()).select_from(stmt.order_by(None).subquery()))
+
+    if sort:
+        stmt = stmt.order_by(*(opt.value for opt in sort))
+
+    if offset:
+        stmt = stmt.offset(offset)
+    if limit:
+        stmt = stmt.limit(limit)
+
+    users = list((await db.scalars(stmt)).all())
+
+    if return_with_count:
+        return users, count
+
+    return users
+
+
+async def get_user_summaries(db: AsyncSession,
+                             limit: int,
+                             cursor: Optional[Tuple[datetime, int]] = None,
+                             backward: bool = False,
+                             admin: Optional[Admin] = None) -> List[UserSummary]:
+    """
+    Retrieves a page of user summaries ordered newest first, using keyset pagination on (created_at, id).
+
+    Unlike OFFSET, the cost of a page doesn't grow with its depth: the database seeks
+    straight to the cursor instead of reading and discarding every earlier row.
+
+    Args:
+        db (AsyncSession): Async database session.
+        limit (int): Number of records to retrieve.
+        cursor (Optional[Tuple[datetime, int]]): (created_at, id) of the row the page starts after.
+        backward (bool): Return the page before the cursor instead of the one after it.
+        admin (Optional[Admin]): Admin to filter users by.
+
+    Only the displayed columns are selected, no User objects or relationships are loaded.
+
+    Returns:
+        List[UserSummary]: Users of the page, newest first.
+    """
+    stmt = select(*USER_SUMMARY_COLUMNS)
+
+    if admin:
+        stmt = stmt.where(User.admin_id == admin.id)
+
+    if cursor:
+        created_at, user_id = cursor
+        if backward:
+            stmt = stmt.where(or_(User.created_at > created_at,
+                                  and_(User.created_at == created_at, User.id > user_id)))
+        else:
+            stmt = stmt.where(or_(User.created_at < created_at,
+                                  and_(User.created_at == created_at, User.id < user_id)))
+
+    if backward:
+        stmt = stmt.order_by(User.created_at.asc(), User.id.asc())
+    else:
+        stmt = stmt.order_by(User.created_at.desc(), User.id.desc())
+
+    users = [UserSummary(*row) for row in (await db.execute(stmt.limit(limit))).all()]
+    if backward:
+        users.reverse()
+    return users
+
+
+async def get_user_counters(db: AsyncSession, admin: Admin = None) -> Dict[UserStatus, Tuple[int, int, int]]:
+    """
+    Reads the materialized per admin x status totals instead of scanning the users table.
+
+    Args:
+        db (AsyncSession): Async database session.
+        admin (Admin, optional): Admin to read the counters of, all admins when omitted.
+
+    Returns:
+        Dict[UserStatus, Tuple[int, int, int]]: (users count, used traffic, data limit) per status.
+    """
+    stmt = select(
+        UserCounter.status,
+        func.sum(UserCounter.users_count),
+        func.sum(UserCounter.used_traffic),
+        func.sum(UserCounter.data_limit),
+    ).group_by(UserCounter.status)
+    if admin:
+        stmt = stmt.where(UserCounter.admin_id == admin.id)
+
+    counters = dict.fromkeys(UserStatus, (0, 0, 0))
+    for status, users_count, used_traffic, data_limit in (await db.execute(stmt)).all():
+        counters[status] = (int(users_count or 0), int(used_traffic or 0), int(data_limit or 0))
+    return counters
+
+
+async def reconcile_user_counters(db: AsyncSession) -> None:
+    """
+    Rebuilds the user counters from the users table in one transaction, fixing drift left by
+    writes that bypass the ORM flush hook (the panel itself, bulk statements).
+
+    Args:
+        db (AsyncSession): Async database session.
+    """
+    totals = select(
+        func.coalesce(User.admin_id, 0),
+        User.status,
+        func.count(User.id),
+        func.coalesce(func.sum(User.used_traffic), 0),
+        func.coalesce(func.sum(User.data_limit), 0),
+    ).group_by(func.coalesce(User.admin_id, 0), User.status)
+
+    await db.execute(delete(UserCounter))
+    await db.execute(insert(UserCounter).from_select(
+        ["admin_id", "status", "users_count", "used_traffic", "data_limit"], totals))
+    await db.commit()
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def _search_user_ids_fulltext(db: AsyncSession, term: str, limit: int, admin: Admin = None) -> List[int]:
+    """
+    Substring search through the full-text index created by setup_hakobot_schema
+    (FTS5 trigram table on SQLite, ngram FULLTEXT index on MySQL), best matches first.
+    """
+    params = {"limit": limit, "admin_id": admin.id if admin else None}
+    admin_filter = "AND u.admin_id = :admin_id" if admin else ""
+    if IS_SQLITE:
+        params["term"] = '"' + term.replace('"', '""') + '"'
+        stmt = text(f"""
+            SELECT u.id FROM users_fts f JOIN users u ON u.id = f.rowid
+            WHERE users_fts MATCH :term {admin_filter}
+            ORDER BY f.rank LIMIT :limit
+        """)
+    else:
+        params["term"] = '"' + term.replace('"', '') + '"'
+        stmt = text(f"""
+            SELECT u.id FROM users u
+            WHERE MATCH(u.username, u.note) AGAINST (:term IN BOOLEAN MODE) {admin_filter}
+            ORDER BY MATCH(u.username, u.note) AGAINST (:term IN BOOLEAN MODE) DESC LIMIT :limit
+        """)
+    return list((await db.scalars(stmt, params)).all())
+
+
+async def search_users(db: AsyncSession, term: str, limit: int = 20, admin: Admin = None) -> List[UserSummary]:
+    """
+    Searches users by username or note, cheapest tier first, and returns at most `limit` ranked results.
+
+    1. exact username match and 2. username prefix match, both served by the username index;
+    3. substring match on username and note through the full-text index, falling back to a
+       capped LIKE scan when the index is missing or the term is too short for n-grams.
+
+    Args:
+        db (AsyncSession): Async database session.
+        term (str): Search term.
+        limit (int): Maximum number of results.
+        admin (Admin, optional): Admin to filter users by.
+
+    Returns:
+        List[UserSummary]: Matching users, best matches first.
+    """
+    term = term.strip()
+    if not term:
+        return []
+
+    def scoped(stmt):
+        return stmt.where(User.admin_id == admin.id) if admin else stmt
+
+    results: Dict[int, UserSummary] = {}
+
+    def collect(rows):
+        for row in rows:
+            if len(results) < limit:
+                results.setdefault(row.id, UserSummary(*row))
+
+    collect((await db.execute(scoped(select(*USER_SUMMARY_COLUMNS).where(User.username == term)))).all())
+    if len(results) >= limit:
+        return list(results.values())
+
+    prefix = scoped(select(*USER_SUMMARY_COLUMNS).where(User.username.like(f"{_escape_like(term)}%", escape="\\")))
+    prefix = prefix.order_by(func.length(User.username), User.username).limit(limit)
+    collect((await db.execute(prefix)).all())
+    if len(results) >= limit:
+        return list(results.values())
+
+    remaining = limit - len(results)
+    ids = None
+    if len(term) >= 3:
+        try:
+            ids = await _search_user_ids_fulltext(db, term, remaining + len(results), admin)
+        except (OperationalError, ProgrammingError):
+            await db.rollback()
+
+    if ids is not None:
+        ids = [user_id for user_id in ids if user_id not in results][:remaining]
+        rows = {row.id: row for row in (await db.execute(select(*USER_SUMMARY_COLUMNS).where(User.id.in_(ids)))).all()}
+        collect(rows[user_id] for user_id in ids if user_id in rows)
+    else:
+        pattern = f"%{_escape_like(term)}%"
+        stmt = scoped(select(*USER_SUMMARY_COLUMNS).where(or_(User.username.ilike(pattern, escape="\\"),
+                                                    User.note.ilike(pattern, escape="\\"))))
+        if results:
+            stmt = stmt.where(User.id.not_in(list(results)))
+        collect((await db.execute(stmt.limit(remaining))).all())
+
+    return list(results.values())
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from config import (
     SQLALCHEMY_DATABASE_URL,
@@ -25,5 +27,38 @@ else:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def get_async_database_url(url: str) -> str:
+    """
+    Maps the configured sync database url onto its asyncio driver
+    (sqlite -> aiosqlite, mysql/mariadb -> aiomysql).
+    """
+    url = make_url(url)
+    if url.drivername.startswith('sqlite'):
+        url = url.set(drivername='sqlite+aiosqlite')
+    elif url.drivername.startswith(('mysql', 'mariadb')):
+        url = url.set(drivername='mysql+aiomysql')
+    return url.render_as_string(hide_password=False)
+
+
+ASYNC_SQLALCHEMY_DATABASE_URL = get_async_database_url(SQLALCHEMY_DATABASE_URL)
+
+if IS_SQLITE:
+    async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+else:
+    async_engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL,
+        pool_size=SQLALCHEMY_POOL_SIZE,
+        max_overflow=SQLIALCHEMY_MAX_OVERFLOW,
+        pool_recycle=3600,
+        pool_timeout=10
+    )
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
 class Base(DeclarativeBase):
     pass
@@ -0,0 +1,110 @@
+"""
+Incremental maintenance of the hakobot_user_counters table.
+
+Every flush that inserts, deletes or changes the owner, status, traffic or limit of a
+User applies the matching deltas to the counters in the same transaction. Writes that
+don't go through the ORM (the panel itself, bulk UPDATE/DELETE statements) are not
+seen here, crud.reconcile_user_counters rebuilds the table to fix that drift.
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from dep.db.base import IS_SQLITE
+from dep.db.models import User, UserCounter
+
+TRACKED_ATTRIBUTES = ("admin_id", "status", "used_traffic", "data_limit")
+
+CounterKey = Tuple[int, str]
+CounterDeltas = Dict[CounterKey, List[int]]
+
+
+def _committed_value(user: User, attr: str):
+    history = inspect(user).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(user, attr)
+
+
+def _add(deltas: CounterDeltas, admin_id, status, sign: int, used_traffic, data_limit):
+    if status is None:
+        return
+    delta = deltas[(admin_id or 0, status)]
+    delta[0] += sign
+    delta[1] += sign * (used_traffic or 0)
+    delta[2] += sign * (data_limit or 0)
+
+
+def user_counter_deltas(session: Session) -> CounterDeltas:
+    deltas: CounterDeltas = defaultdict(lambda: [0, 0, 0])
+
+    for user in session.new:
+        if isinstance(user, User):
+            _add(deltas, user.admin_id, user.status, 1, user.used_traffic, user.data_limit)
+
+    for user in session.deleted:
+        if isinstance(user, User):
+            old = {attr: _committed_value(user, attr) for attr in TRACKED_ATTRIBUTES}
+            _add(deltas, old["admin_id"], old["status"], -1, old["used_traffic"], old["data_limit"])
+
+    for user in session.dirty:
+        if not isinstance(user, User):
+            continue
+        state = inspect(user)
+        if not any(state.attrs[attr].history.has_changes() for attr in TRACKED_ATTRIBUTES):
+            continue
+        old = {attr: _committed_value(user, attr) for attr in TRACKED_ATTRIBUTES}
+        _add(deltas, old["admin_id"], old["status"], -1, old["used_traffic"], old["data_limit"])
+        _add(deltas, user.admin_id, user.status, 1, user.used_traffic, user.data_limit)
+
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def user_row_deltas(before: Iterable, after: Iterable) -> CounterDeltas:
+    """
+    Deltas between user rows read before and after a bulk statement, for writes the flush hook can't see.
+    Rows need admin_id, status, used_traffic and data_limit, a deleted user simply has no `after` row.
+    """
+    deltas: CounterDeltas = defaultdict(lambda: [0, 0, 0])
+    for row in before:
+        _add(deltas, row.admin_id, row.status, -1, row.used_traffic, row.data_limit)
+    for row in after:
+        _add(deltas, row.admin_id, row.status, 1, row.used_traffic, row.data_limit)
+    return {key: delta for key, delta in deltas.items() if any(delta)}
+
+
+def apply_user_counter_deltas(connection, deltas: CounterDeltas):
+    insert = sqlite_insert if IS_SQLITE else mysql_insert
+    table = UserCounter.__table__
+
+    for (admin_id, status), (users_count, used_traffic, data_limit) in deltas.items():
+        stmt = insert(table).values(
+            admin_id=admin_id,
+            status=status,
+            users_count=users_count,
+            used_traffic=used_traffic,
+            data_limit=data_limit,
+        )
+        increments = {
+            "users_count": table.c.users_count + users_count,
+            "used_traffic": table.c.used_traffic + used_traffic,
+            "data_limit": table.c.data_limit + data_limit,
+        }
+        if IS_SQLITE:
+            stmt = stmt.on_conflict_do_update(index_elements=[table.c.admin_id, table.c.status], set_=increments)
+        else:
+            stmt = stmt.on_duplicate_key_update(**increments)
+        connection.execute(stmt)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_user_counters(session: Session, flush_context):
+    deltas = user_counter_deltas(session)
+    if deltas:
+        apply_user_counter_deltas(session.connection(), deltas)
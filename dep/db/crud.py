@@ -1,12 +1,31 @@
+import secrets
+import time
+from dataclasses import dataclass, field
+from uuid import uuid4
+from datetime import datetime
 from enum import Enum
 
 from sqlalchemy.orm import Query, Session, joinedload
-from typing import Dict, List, Optional, Tuple, Union
-
-from sqlalchemy import and_, delete, func, or_
-
-from db.models import System, Admin, User
-from models.user import UserStatus, UserDataLimitResetStrategy
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select, update
+
+from dep.db.counters import apply_user_counter_deltas, user_row_deltas
+from dep.db.models import (
+    Admin,
+    BulkJob,
+    NextPlan,
+    NodeUserUsage,
+    NotificationReminder,
+    Proxy,
+    ProxyInbound,
+    System,
+    User,
+    UserUsageResetLogs,
+    excluded_inbounds_association,
+)
+from dep.models.proxy import ProxyTypes
+from dep.models.user import UserStatus, UserDataLimitResetStrategy
 
 
 def get_system_usage(db: Session) -> System:
@@ -36,12 +55,31 @@ def get_users_count(db: Session, status: UserStatus = None, admin: Admin = None)
     """
     query = db.query(User.id)
     if admin:
-        query = query.filter(User.admin == admin)
+        query = query.filter(User.admin_id == admin.id)
     if status:
         query = query.filter(User.status == status)
     return query.count()
 
 
+def count_users_by_status(db: Session, admin: Admin = None) -> Dict[UserStatus, int]:
+    """
+    Retrieves the number of users in every status with a single GROUP BY query.
+
+    Args:
+        db (Session): Database session.
+        admin (Admin, optional): Admin to filter users by.
+
+    Returns:
+        Dict[UserStatus, int]: Count per status, statuses without users are 0.
+    """
+    query = db.query(User.status, func.count(User.id))
+    if admin:
+        query = query.filter(User.admin_id == admin.id)
+    counts = dict.fromkeys(UserStatus, 0)
+    counts.update(query.group_by(User.status).all())
+    return counts
+
+
 def get_admin_by_telegram_id(db: Session, telegram_id: int) -> Admin:
     """
     Retrieves an admin by their Telegram ID.
@@ -134,7 +172,7 @@ def get_users(db: Session,
             query = query.filter(User.data_limit_reset_strategy == reset_strategy)
 
     if admin:
-        query = query.filter(User.admin == admin)
+        query = query.filter(User.admin_id == admin.id)
 
     if admins:
         query = query.filter(User.admin.has(Admin.username.in_(admins)))
@@ -154,3 +192,419 @@ def get_users(db: Session,
         return query.all(), count
 
     return query.all()
+
+
+@dataclass(slots=True)
+class UserSummary:
+    """Display-only projection of a user row, without relationships."""
+    id: int
+    username: str
+    status: UserStatus
+    used_traffic: int
+    data_limit: Optional[int]
+    expire: Optional[int]
+    created_at: datetime
+
+
+USER_SUMMARY_COLUMNS = (
+    User.id,
+    User.username,
+    User.status,
+    User.used_traffic,
+    User.data_limit,
+    User.expire,
+    User.created_at,
+)
+
+
+def get_user_summaries(db: Session,
+                       offset: Optional[int] = None,
+                       limit: Optional[int] = None,
+                       sort: Optional[List[UsersSortingOptions]] = None,
+                       status: Optional[Union[UserStatus, list]] = None,
+                       admin: Optional[Admin] = None) -> List[UserSummary]:
+    """
+    Retrieves the columns user lists display, without loading User objects or their relationships.
+
+    Args:
+        db (Session): Database session.
+        offset (Optional[int]): Number of records to skip.
+        limit (Optional[int]): Number of records to retrieve.
+        sort (Optional[List[UsersSortingOptions]]): Sorting options.
+        status (Optional[Union[UserStatus, list]]): User status or list of statuses to filter by.
+        admin (Optional[Admin]): Admin to filter users by.
+
+    Returns:
+        List[UserSummary]: Projected users.
+    """
+    query = db.query(*USER_SUMMARY_COLUMNS)
+
+    if status:
+        if isinstance(status, list):
+            query = query.filter(User.status.in_(status))
+        else:
+            query = query.filter(User.status == status)
+
+    if admin:
+        query = query.filter(User.admin_id == admin.id)
+
+    if sort:
+        query = query.order_by(*(opt.value for opt in sort))
+
+    if offset:
+        query = query.offset(offset)
+    if limit:
+        query = query.limit(limit)
+
+    return [UserSummary(*row) for row in query.all()]
+
+
+BULK_UPDATE_CHUNK_SIZE = 1000
+
+# statuses mass operations leave alone, like the per-user loops of the bot did
+BULK_UPDATE_SKIPPED_STATUSES = (UserStatus.limited, UserStatus.expired)
+
+
+def _bulk_update_users(db: Session,
+                       condition,
+                       values: List[tuple],
+                       admin: Optional[Admin] = None,
+                       chunk_size: int = BULK_UPDATE_CHUNK_SIZE) -> Iterator[List[UserSummary]]:
+    """
+    Applies `values`, (column, value) pairs, to every user matching `condition` with one UPDATE per chunk of ids.
+
+    The SET clauses keep the order of `values`: MySQL evaluates single-table UPDATE assignments left to
+    right, so an expression reading a column has to come before the assignment that changes it.
+
+    Chunks are walked in id order (keyset), each one is locked, updated and committed on its own so
+    no transaction holds the users table for the whole run. The rows as they are after the update
+    are read back with RETURNING where the dialect supports it, otherwise re-selected by id.
+    """
+    if admin:
+        condition = and_(condition, User.admin_id == admin.id)
+    returning = db.get_bind().dialect.update_returning
+    columns = USER_SUMMARY_COLUMNS + (User.admin_id,)
+    last_id = 0
+
+    while True:
+        before = (db.query(User.id, User.admin_id, User.status, User.used_traffic, User.data_limit)
+                  .filter(condition, User.id > last_id)
+                  .order_by(User.id)
+                  .limit(chunk_size)
+                  .with_for_update()
+                  .all())
+        if not before:
+            return
+        last_id = before[-1].id
+        ids = [row.id for row in before]
+
+        stmt = (update(User)
+                .where(User.id.in_(ids), condition)
+                .ordered_values(*values)
+                .execution_options(synchronize_session=False))
+        if returning:
+            after = db.execute(stmt.returning(*columns)).all()
+        else:
+            db.execute(stmt)
+            after = db.query(*columns).filter(User.id.in_(ids)).all()
+
+        updated = {row.id for row in after}
+        deltas = user_row_deltas([row for row in before if row.id in updated], after)
+        if deltas:
+            apply_user_counter_deltas(db.connection(), deltas)
+        db.commit()
+
+        yield [UserSummary(*row[:-1]) for row in after]
+
+
+def bulk_add_data_limit(db: Session,
+                        amount: int,
+                        admin: Optional[Admin] = None,
+                        chunk_size: int = BULK_UPDATE_CHUNK_SIZE) -> Iterator[List[UserSummary]]:
+    """
+    Adds `amount` bytes (may be negative) to the data limit of every limited-traffic user that isn't
+    limited or expired, in set-based chunks. Active users whose usage reaches the new limit become limited,
+    users whose limit would drop to zero or below are skipped.
+
+    Args:
+        db (Session): Database session.
+        amount (int): Bytes to add to the data limit.
+        admin (Optional[Admin]): Admin to restrict the operation to.
+        chunk_size (int): Number of users updated per transaction.
+
+    Yields:
+        List[UserSummary]: Users updated by each committed chunk, as they are after the update.
+    """
+    now = datetime.utcnow()
+    new_limit = User.data_limit + amount
+    becomes_limited = and_(User.status == UserStatus.active, User.used_traffic >= new_limit)
+    condition = and_(
+        User.data_limit > 0,
+        User.status.not_in(BULK_UPDATE_SKIPPED_STATUSES),
+        new_limit > 0,
+    )
+    return _bulk_update_users(db, condition, [
+        (User.last_status_change, case((becomes_limited, now), else_=User.last_status_change)),
+        (User.status, case((becomes_limited, UserStatus.limited), else_=User.status)),
+        (User.data_limit, new_limit),
+        (User.edit_at, now),
+    ], admin=admin, chunk_size=chunk_size)
+
+
+def bulk_add_expire(db: Session,
+                    seconds: int,
+                    admin: Optional[Admin] = None,
+                    chunk_size: int = BULK_UPDATE_CHUNK_SIZE) -> Iterator[List[UserSummary]]:
+    """
+    Shifts the expiry of every user with an expiry date that isn't limited or expired by `seconds`
+    (may be negative), in set-based chunks. Active users whose new expiry is in the past become expired.
+
+    Args:
+        db (Session): Database session.
+        seconds (int): Seconds to add to the expiry timestamp.
+        admin (Optional[Admin]): Admin to restrict the operation to.
+        chunk_size (int): Number of users updated per transaction.
+
+    Yields:
+        List[UserSummary]: Users updated by each committed chunk, as they are after the update.
+    """
+    now = datetime.utcnow()
+    new_expire = User.expire + seconds
+    becomes_expired = and_(User.status == UserStatus.active, new_expire <= int(time.time()))
+    condition = and_(
+        User.expire > 0,
+        User.status.not_in(BULK_UPDATE_SKIPPED_STATUSES),
+    )
+    return _bulk_update_users(db, condition, [
+        (User.last_status_change, case((becomes_expired, now), else_=User.last_status_change)),
+        (User.status, case((becomes_expired, UserStatus.expired), else_=User.status)),
+        (User.expire, new_expire),
+        (User.edit_at, now),
+    ], admin=admin, chunk_size=chunk_size)
+
+
+BULK_DELETE_CHUNK_SIZE = 500
+
+
+@dataclass(slots=True)
+class BulkDeleteChunk:
+    """One committed chunk of a bulk delete."""
+    users: List[UserSummary]
+    removals: Dict[str, List[str]]  # inbound tag -> client emails to remove from the core
+    processed: int  # users deleted by the job so far, including earlier interrupted runs
+
+
+def bulk_delete_users(db: Session,
+                      job_name: str,
+                      status: Union[UserStatus, list],
+                      inbounds_by_protocol: Dict[str, List[dict]],
+                      admin: Optional[Admin] = None,
+                      chunk_size: int = BULK_DELETE_CHUNK_SIZE) -> Iterator[BulkDeleteChunk]:
+    """
+    Deletes users with the given status in primary key chunks, removing their child rows with set-based
+    statements instead of ORM cascades.
+
+    The position of the run is stored in hakobot_bulk_jobs under `job_name` and advanced in the same
+    transaction as each chunk, so a run that was interrupted continues after the last committed chunk.
+    The job row is removed once no users are left.
+
+    Args:
+        db (Session): Database session.
+        job_name (str): Key of the resumable cursor.
+        status (Union[UserStatus, list]): User status or list of statuses to delete.
+        inbounds_by_protocol (Dict[str, List[dict]]): Inbounds of the core config, to group removals by tag.
+        admin (Optional[Admin]): Admin to restrict the operation to.
+        chunk_size (int): Number of users deleted per transaction.
+
+    Yields:
+        BulkDeleteChunk: Deleted users of each committed chunk and the core clients to remove for them.
+    """
+    statuses = status if isinstance(status, list) else [status]
+    job = db.get(BulkJob, job_name)
+    if job is None:
+        job = BulkJob(name=job_name, last_id=0, processed=0)
+        db.add(job)
+        db.commit()
+
+    while True:
+        query = (db.query(*USER_SUMMARY_COLUMNS, User.admin_id)
+                 .filter(User.status.in_(statuses), User.id > job.last_id))
+        if admin:
+            query = query.filter(User.admin_id == admin.id)
+        rows = query.order_by(User.id).limit(chunk_size).with_for_update().all()
+        if not rows:
+            db.delete(job)
+            db.commit()
+            return
+
+        ids = [row.id for row in rows]
+        proxies = db.query(Proxy.id, Proxy.user_id, Proxy.type).filter(Proxy.user_id.in_(ids)).all()
+        proxy_ids = [proxy.id for proxy in proxies]
+        excluded: Dict[int, set] = {}
+        if proxy_ids:
+            association = excluded_inbounds_association.c
+            for proxy_id, tag in db.execute(select(association.proxy_id, association.inbound_tag)
+                                            .where(association.proxy_id.in_(proxy_ids))):
+                excluded.setdefault(proxy_id, set()).add(tag)
+
+        usernames = {row.id: row.username for row in rows}
+        removals: Dict[str, List[str]] = {}
+        for proxy in proxies:
+            email = f"{proxy.user_id}.{usernames[proxy.user_id]}"
+            for inbound in inbounds_by_protocol.get(proxy.type, []):
+                if inbound["tag"] not in excluded.get(proxy.id, ()):
+                    removals.setdefault(inbound["tag"], []).append(email)
+
+        if proxy_ids:
+            db.execute(delete(excluded_inbounds_association)
+                       .where(excluded_inbounds_association.c.proxy_id.in_(proxy_ids)))
+        for model in (Proxy, NextPlan, NodeUserUsage, NotificationReminder):
+            db.execute(delete(model).where(model.user_id.in_(ids)).execution_options(synchronize_session=False))
+        db.execute(update(UserUsageResetLogs)
+                   .where(UserUsageResetLogs.user_id.in_(ids))
+                   .values(user_id=None)
+                   .execution_options(synchronize_session=False))
+        db.execute(delete(User).where(User.id.in_(ids)).execution_options(synchronize_session=False))
+
+        deltas = user_row_deltas(rows, [])
+        if deltas:
+            apply_user_counter_deltas(db.connection(), deltas)
+
+        job.last_id = ids[-1]
+        job.processed += len(ids)
+        job.updated_at = datetime.utcnow()
+        db.commit()
+
+        yield BulkDeleteChunk(
+            users=[UserSummary(*row[:-1]) for row in rows],
+            removals=removals,
+            processed=job.processed,
+        )
+
+
+# rows per statement when a bulk operation filters by a list of values
+BULK_IN_CHUNK_SIZE = 500
+
+
+def _chunks(values: list, size: int = BULK_IN_CHUNK_SIZE) -> Iterator[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _new_proxy_settings(proxy_type: ProxyTypes, settings: dict) -> dict:
+    """Fills in the per-user credentials of a proxy, like the proxy settings models do on creation."""
+    settings = dict(settings)
+    if proxy_type in (ProxyTypes.VMess, ProxyTypes.VLESS):
+        settings.setdefault("id", str(uuid4()))
+    elif proxy_type == ProxyTypes.Trojan:
+        settings.setdefault("password", secrets.token_urlsafe(16))
+    elif proxy_type == ProxyTypes.Shadowsocks:
+        settings.setdefault("password", secrets.token_urlsafe(16))
+        settings.setdefault("method", "chacha20-ietf-poly1305")
+    return settings
+
+
+@dataclass(slots=True)
+class BulkCreateResult:
+    """Outcome of bulk_create_users, nothing is inserted when `conflicts` is not empty."""
+    users: List[UserSummary] = field(default_factory=list)
+    conflicts: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)  # seconds per stage
+
+
+def bulk_create_users(db: Session,
+                      usernames: List[str],
+                      proxies: Dict[ProxyTypes, dict],
+                      inbounds: Dict[ProxyTypes, List[str]],
+                      inbounds_by_protocol: Dict[str, List[dict]],
+                      status: UserStatus = UserStatus.active,
+                      admin: Optional[Admin] = None,
+                      **values: Any) -> BulkCreateResult:
+    """
+    Creates users sharing the same plan in a single transaction.
+
+    All usernames are checked against the unique index with one query up front, then users, proxies
+    and excluded inbounds are written with one executemany INSERT each. Every user gets its own
+    proxy credentials.
+
+    Args:
+        db (Session): Database session.
+        usernames (List[str]): Usernames to create.
+        proxies (Dict[ProxyTypes, dict]): Proxy settings shared by the users, credentials are generated.
+        inbounds (Dict[ProxyTypes, List[str]]): Enabled inbound tags per proxy type.
+        inbounds_by_protocol (Dict[str, List[dict]]): Inbounds of the core config.
+        status (UserStatus): Status of the new users.
+        admin (Optional[Admin]): Owner of the new users.
+        **values: Other User columns shared by the users, e.g. expire, data_limit, on_hold_expire_duration.
+
+    Returns:
+        BulkCreateResult: Created users and the duration of each stage.
+    """
+    result = BulkCreateResult()
+    started = time.perf_counter()
+
+    def stage(name: str):
+        nonlocal started
+        now = time.perf_counter()
+        result.timings[name] = now - started
+        started = now
+
+    for chunk in _chunks(usernames):
+        result.conflicts.extend(db.scalars(select(User.username).where(User.username.in_(chunk))).all())
+    stage("validate")
+    if result.conflicts or not usernames:
+        return result
+
+    now = datetime.utcnow()
+    db.execute(insert(User), [
+        {
+            **values,
+            "username": username,
+            "status": status,
+            "admin_id": admin.id if admin else None,
+            "used_traffic": 0,
+            "data_limit_reset_strategy": UserDataLimitResetStrategy.no_reset,
+            "created_at": now,
+            "last_status_change": now,
+        } for username in usernames
+    ])
+    rows = []
+    for chunk in _chunks(usernames):
+        rows.extend(db.query(*USER_SUMMARY_COLUMNS, User.admin_id).filter(User.username.in_(chunk)).all())
+    stage("insert_users")
+
+    proxy_rows = [
+        {"user_id": row.id, "type": proxy_type, "settings": _new_proxy_settings(proxy_type, settings)}
+        for row in rows for proxy_type, settings in proxies.items()
+    ]
+    db.execute(insert(Proxy), proxy_rows)
+
+    excluded_tags = {
+        proxy_type: [inbound["tag"] for inbound in inbounds_by_protocol.get(proxy_type, [])
+                     if inbound["tag"] not in inbounds.get(proxy_type, [])]
+        for proxy_type in proxies
+    }
+    if any(excluded_tags.values()):
+        tags = {tag for tags in excluded_tags.values() for tag in tags}
+        missing = tags - set(db.scalars(select(ProxyInbound.tag).where(ProxyInbound.tag.in_(tags))).all())
+        if missing:
+            db.execute(insert(ProxyInbound), [{"tag": tag} for tag in missing])
+
+        user_ids = [row.id for row in rows]
+        associations = []
+        for chunk in _chunks(user_ids):
+            for proxy_id, proxy_type in db.execute(
+                    select(Proxy.id, Proxy.type).where(Proxy.user_id.in_(chunk))):
+                associations.extend({"proxy_id": proxy_id, "inbound_tag": tag} for tag in excluded_tags[proxy_type])
+        if associations:
+            db.execute(insert(excluded_inbounds_association), associations)
+    stage("insert_proxies")
+
+    deltas = user_row_deltas([], rows)
+    if deltas:
+        apply_user_counter_deltas(db.connection(), deltas)
+    db.commit()
+    stage("commit")
+
+    result.users = [UserSummary(*row[:-1]) for row in rows]
+    return result
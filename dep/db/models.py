@@ -46,10 +46,23 @@ class Payment(Base):
     amount = Column(BigInteger, nullable=False)
     payment_type = Column(Enum(PaymentType), nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
+    idempotency_key = Column(String(64), unique=True, nullable=True)
 
     admin = relationship("Admin", back_populates="payments")
 
 
+class BalanceSnapshot(Base):
+    """Balance of an admin right after payment `last_payment_id`, the starting point of running balances."""
+    __tablename__ = "hakobot_balance_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    admin_id = Column(Integer, ForeignKey("admins.id"), nullable=False)
+    period = Column(String(8), nullable=False)  # "day" or "month"
+    last_payment_id = Column(Integer, nullable=False)
+    balance = Column(BigInteger, nullable=False)
+    taken_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Admin(Base):
     __tablename__ = "admins"
 
@@ -69,6 +82,28 @@ class Admin(Base):
     usage_logs = relationship("AdminUsageLogs", back_populates="admin")
 
 
+class UserCounter(Base):
+    """Per admin x status user totals, kept in sync by dep.db.counters and reconciled periodically."""
+    __tablename__ = "hakobot_user_counters"
+
+    admin_id = Column(Integer, primary_key=True, autoincrement=False)  # 0 for users without an admin
+    status = Column(Enum(UserStatus), primary_key=True)
+    users_count = Column(BigInteger, nullable=False, default=0)
+    used_traffic = Column(BigInteger, nullable=False, default=0)
+    data_limit = Column(BigInteger, nullable=False, default=0)
+
+
+class BulkJob(Base):
+    """Cursor of a resumable bulk operation over users, removed once the operation completes."""
+    __tablename__ = "hakobot_bulk_jobs"
+
+    name = Column(String(64), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)  # cursor: last users.id processed
+    processed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
 class AdminUsageLogs(Base):
     __tablename__ = "admin_usage_logs"
 
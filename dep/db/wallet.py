@@ -0,0 +1,242 @@
+"""
+Wallet of resellers: Admin.hakobot_balance and its payments ledger.
+
+A balance only changes through a single conditional UPDATE (`balance >= amount` for debits),
+so concurrent purchases can't overdraw it. The Payment row is written in the same transaction.
+An optional idempotency key, unique in the payments table, makes retries of the same operation
+(a double tapped button, a re-delivered update) return the original payment instead of charging twice.
+
+debit and credit only flush, the caller owns the transaction: it commits the payment together with
+whatever it pays for (or rolls both back), then drops any cached copy of the balance.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, case, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from dep.db.models import Admin, BalanceSnapshot, Payment, PaymentType
+
+
+class WalletError(Exception):
+    pass
+
+
+class InsufficientBalanceError(WalletError):
+    pass
+
+
+class AdminNotFoundError(WalletError):
+    pass
+
+
+class IdempotencyKeyMismatchError(WalletError):
+    pass
+
+
+async def get_payment_by_idempotency_key(db: AsyncSession, idempotency_key: str) -> Optional[Payment]:
+    return await db.scalar(select(Payment).where(Payment.idempotency_key == idempotency_key))
+
+
+def _replayed(payment: Payment, admin_id: int, amount: int, payment_type: PaymentType) -> Payment:
+    if (payment.admin_id, payment.amount, payment.payment_type) != (admin_id, amount, payment_type):
+        raise IdempotencyKeyMismatchError(
+            f"idempotency key {payment.idempotency_key!r} was used for a {payment.payment_type.value}"
+            f" of {payment.amount} by admin {payment.admin_id}")
+    return payment
+
+
+async def _concurrent_payment(db: AsyncSession, idempotency_key: Optional[str]) -> Optional[Payment]:
+    if not idempotency_key:
+        return None
+    # a locking read sees rows committed after the transaction's snapshot was taken
+    return await db.scalar(select(Payment).where(Payment.idempotency_key == idempotency_key).with_for_update())
+
+
+async def _apply(db: AsyncSession,
+                 admin_id: int,
+                 amount: int,
+                 payment_type: PaymentType,
+                 idempotency_key: Optional[str]) -> Payment:
+    if amount <= 0:
+        raise ValueError(f"amount must be positive, got {amount}")
+
+    if idempotency_key:
+        payment = await get_payment_by_idempotency_key(db, idempotency_key)
+        if payment:
+            return _replayed(payment, admin_id, amount, payment_type)
+
+    stmt = update(Admin).where(Admin.id == admin_id)
+    if payment_type == PaymentType.WITHDRAW:
+        stmt = stmt.where(Admin.hakobot_balance >= amount).values(hakobot_balance=Admin.hakobot_balance - amount)
+    else:
+        stmt = stmt.values(hakobot_balance=Admin.hakobot_balance + amount)
+
+    payment = None
+    try:
+        # a savepoint, so a duplicate key only undoes this payment and not the caller's transaction
+        async with db.begin_nested():
+            result = await db.execute(stmt.execution_options(synchronize_session=False))
+            if result.rowcount == 1:
+                payment = Payment(admin_id=admin_id, amount=amount, payment_type=payment_type,
+                                  idempotency_key=idempotency_key)
+                db.add(payment)
+    except IntegrityError:
+        # a concurrent call with the same key committed first, its payment wins
+        payment = await _concurrent_payment(db, idempotency_key)
+        if payment is None:
+            raise
+        return _replayed(payment, admin_id, amount, payment_type)
+
+    if payment is None:
+        # the concurrent call may also have taken the balance this one was refused for
+        if concurrent := await _concurrent_payment(db, idempotency_key):
+            return _replayed(concurrent, admin_id, amount, payment_type)
+        if await db.scalar(select(Admin.id).where(Admin.id == admin_id)) is None:
+            raise AdminNotFoundError(f"admin {admin_id} not found")
+        raise InsufficientBalanceError(f"balance of admin {admin_id} is less than {amount}")
+    return payment
+
+
+async def debit(db: AsyncSession, admin_id: int, amount: int, idempotency_key: Optional[str] = None) -> Payment:
+    """
+    Withdraws `amount` from the admin's balance and records it in the ledger, the caller commits.
+
+    Raises:
+        InsufficientBalanceError: The balance is lower than `amount`, nothing was changed.
+        AdminNotFoundError: No admin with `admin_id`.
+        IdempotencyKeyMismatchError: `idempotency_key` belongs to a different payment.
+    """
+    return await _apply(db, admin_id, amount, PaymentType.WITHDRAW, idempotency_key)
+
+
+async def credit(db: AsyncSession, admin_id: int, amount: int, idempotency_key: Optional[str] = None) -> Payment:
+    """
+    Deposits `amount` into the admin's balance and records it in the ledger, the caller commits.
+
+    Raises:
+        AdminNotFoundError: No admin with `admin_id`.
+        IdempotencyKeyMismatchError: `idempotency_key` belongs to a different payment.
+    """
+    return await _apply(db, admin_id, amount, PaymentType.DEPOSIT, idempotency_key)
+
+
+# amount with the sign it has on the balance
+SIGNED_AMOUNT = case((Payment.payment_type == PaymentType.DEPOSIT, Payment.amount), else_=-Payment.amount)
+
+
+@dataclass(slots=True)
+class LedgerEntry:
+    id: int
+    amount: int
+    payment_type: PaymentType
+    timestamp: datetime
+    balance_after: int  # wallet balance right after this payment
+
+
+async def take_balance_snapshots(db: AsyncSession, period: str = "day") -> int:
+    """
+    Records the current balance of every admin with payments, next to the id of its latest payment,
+    unless the latest snapshot of the same period already has both. Returns the number of snapshots taken.
+
+    The balance is Admin.hakobot_balance rather than a sum of the ledger, so running balances agree
+    with the wallet even when a balance was set directly. Debits and credits change the balance and
+    add the payment in one transaction, so both are read consistently here.
+    """
+    latest_ids = (select(BalanceSnapshot.admin_id, func.max(BalanceSnapshot.last_payment_id).label("last_payment_id"))
+                  .where(BalanceSnapshot.period == period)
+                  .group_by(BalanceSnapshot.admin_id)
+                  .subquery())
+    latest = {
+        admin_id: (last_payment_id, balance) for admin_id, last_payment_id, balance in await db.execute(
+            select(BalanceSnapshot.admin_id, BalanceSnapshot.last_payment_id, BalanceSnapshot.balance)
+            .join(latest_ids, (BalanceSnapshot.admin_id == latest_ids.c.admin_id)
+                  & (BalanceSnapshot.last_payment_id == latest_ids.c.last_payment_id))
+            .where(BalanceSnapshot.period == period))
+    }
+    balances = (await db.execute(
+        select(Admin.id, Admin.hakobot_balance, func.max(Payment.id))
+        .join(Payment, Payment.admin_id == Admin.id)
+        .group_by(Admin.id, Admin.hakobot_balance))).all()
+
+    snapshots = [
+        BalanceSnapshot(admin_id=admin_id, period=period, last_payment_id=last_payment_id, balance=balance or 0)
+        for admin_id, balance, last_payment_id in balances
+        if latest.get(admin_id) != (last_payment_id, balance or 0)
+    ]
+    db.add_all(snapshots)
+    await db.commit()
+    return len(snapshots)
+
+
+async def prune_balance_snapshots(db: AsyncSession, period: str, keep_days: int) -> None:
+    """Drops snapshots of `period` older than `keep_days`, coarser periods keep covering that range."""
+    await db.execute(delete(BalanceSnapshot).where(
+        BalanceSnapshot.period == period,
+        BalanceSnapshot.taken_at < datetime.utcnow() - timedelta(days=keep_days)))
+    await db.commit()
+
+
+async def get_balance_history(db: AsyncSession,
+                              admin_id: int,
+                              limit: int = 10,
+                              before_id: Optional[int] = None) -> List[LedgerEntry]:
+    """
+    Retrieves a page of the admin's payments, newest first, with the running balance after each one.
+
+    Balances are anchored on Admin.hakobot_balance, so the newest entry matches the wallet. The balance
+    after the newest payment of the page comes from the nearest snapshot at or after it (the current
+    balance for the first pages) minus the payments in between, older rows of the page are derived
+    from it, so the cost doesn't grow with the length of the ledger.
+
+    Args:
+        db (AsyncSession): Async database session.
+        admin_id (int): Owner of the wallet.
+        limit (int): Page size.
+        before_id (Optional[int]): Keyset cursor, id of the last payment of the previous page.
+
+    Returns:
+        List[LedgerEntry]: Payments of the page, newest first.
+    """
+    stmt = select(Payment.id, Payment.amount, Payment.payment_type, Payment.timestamp, SIGNED_AMOUNT) \
+        .where(Payment.admin_id == admin_id)
+    if before_id:
+        stmt = stmt.where(Payment.id < before_id)
+    rows = (await db.execute(stmt.order_by(Payment.id.desc()).limit(limit))).all()
+    if not rows:
+        return []
+
+    newest_id = rows[0].id
+    snapshot = (await db.execute(
+        select(BalanceSnapshot.last_payment_id, BalanceSnapshot.balance)
+        .where(BalanceSnapshot.admin_id == admin_id, BalanceSnapshot.last_payment_id >= newest_id)
+        .order_by(BalanceSnapshot.last_payment_id, BalanceSnapshot.id.desc())
+        .limit(1))).first()
+    if snapshot:
+        until_id, balance = snapshot
+        later = and_(Payment.id > newest_id, Payment.id <= until_id)
+    else:
+        balance = await db.scalar(select(Admin.hakobot_balance).where(Admin.id == admin_id)) or 0
+        later = Payment.id > newest_id
+    balance -= await db.scalar(
+        select(func.coalesce(func.sum(SIGNED_AMOUNT), 0)).where(Payment.admin_id == admin_id, later))
+
+    # snapshots inside the page take over, so a balance set outside the ledger shows up at the same
+    # payment whichever page it's viewed from
+    snapshots = {
+        last_payment_id: snapshot_balance for last_payment_id, snapshot_balance in await db.execute(
+            select(BalanceSnapshot.last_payment_id, BalanceSnapshot.balance)
+            .where(BalanceSnapshot.admin_id == admin_id,
+                   BalanceSnapshot.last_payment_id >= rows[-1].id,
+                   BalanceSnapshot.last_payment_id < newest_id)
+            .order_by(BalanceSnapshot.id))
+    }
+
+    entries = []
+    for row in rows:
+        balance = snapshots.get(row.id, balance)
+        entries.append(LedgerEntry(row.id, row.amount, row.payment_type, row.timestamp, int(balance)))
+        balance -= row[4]
+    return entries
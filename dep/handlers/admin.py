@@ -5,6 +5,7 @@ import os
 import random
 import re
 import string
+import time
 from datetime import datetime
 
 import qrcode
@@ -27,6 +28,7 @@ from dep.models.user import (
 from dep.models.user_template import UserTemplateResponse
 # from dep.telegram import bot
 from dep.utils.custom_filters import cb_query_equals, cb_query_startswith
+from dep.utils.export import AuditExport
 from dep.utils.keyboard import BotKeyboard
 from dep.utils.shared import (
     get_number_at_end,
@@ -37,19 +39,83 @@ from dep.utils.shared import (
 )
 from dep.utils.store import MemoryStorage
 from dep.utils.system import cpu_usage, memory_usage, readable_size, realtime_bandwidth
-from config import TELEGRAM_DEFAULT_VLESS_FLOW, TELEGRAM_LOGGER_CHANNEL_ID
+from dep.xray.clients import shared_index
+from config import (
+    AUDIT_EXPORT_FORMAT,
+    AUDIT_EXPORT_GZIP,
+    AUDIT_EXPORT_MAX_MEMORY,
+    TELEGRAM_DEFAULT_VLESS_FLOW,
+    TELEGRAM_LOGGER_CHANNEL_ID
+)
 
 mem_store = MemoryStorage()
 
+# minimum seconds between two edits of an "In Progress..." message
+PROGRESS_UPDATE_INTERVAL = 2
+
+
+def sync_users(users: dict):
+    """
+    Pushes users (id -> username) to the core and the connected nodes as they are in the database
+    after they were created, changed or deleted, through the process-wide client index.
+    """
+    apply_client_delta(shared_index(xray.config).replace_db_users(users))
+
+
+def apply_client_delta(delta):
+    remove_inbound_users(delta.removed)
+    add_inbound_users(delta.added)
+
+
+def remove_inbound_users(removals: dict):
+    """Removes clients grouped by inbound tag from the core and the connected nodes."""
+    apis = [xray.api] + [node.api for node in list(xray.nodes.values()) if node.connected and node.started]
+    for api in apis:
+        for tag, emails in removals.items():
+            for email in emails:
+                try:
+                    api.remove_inbound_user(tag=tag, email=email, timeout=30)
+                except (xray.exc.EmailNotFoundError, xray.exc.ConnectionError):
+                    pass
+
+
+AUDIT_FIELDS = ('USERNAME', 'EXIPRY', 'USAGE/LIMIT', 'STATUS')
+
+
+def audit_rows(users):
+    for user in users:
+        yield (
+            user.username,
+            datetime.fromtimestamp(user.expire) if user.expire else "never",
+            f'{readable_size(user.used_traffic) if user.used_traffic else 0}'
+            f'/{readable_size(user.data_limit) if user.data_limit else "Unlimited"}',
+            user.status,
+        )
+
+
+def new_audit_export(name: str) -> AuditExport:
+    return AuditExport(name, AUDIT_FIELDS, fmt=AUDIT_EXPORT_FORMAT, compress=AUDIT_EXPORT_GZIP,
+                       max_memory=AUDIT_EXPORT_MAX_MEMORY)
+
+
+def send_audit_export(export: AuditExport, caption: str):
+    """Uploads a finished export to the logger channel straight from its buffer."""
+    try:
+        bot.send_document(TELEGRAM_LOGGER_CHANNEL_ID, export.open(), caption=caption, parse_mode='HTML',
+                          visible_file_name=export.file_name)
+    except ApiTelegramException:
+        pass
+
 
 def get_system_info():
     mem = memory_usage()
     cpu = cpu_usage()
     with GetDB() as db:
         bandwidth = crud.get_system_usage(db)
-        total_users = crud.get_users_count(db)
-        active_users = crud.get_users_count(db, UserStatus.active)
-        onhold_users = crud.get_users_count(db, UserStatus.on_hold)
+        counts = crud.count_users_by_status(db)
+    total_users = sum(counts.values())
+    active_users = counts[UserStatus.active]
+    onhold_users = counts[UserStatus.on_hold]
     return """\
 🎛 *CPU Cores*: `{cpu_cores}`
 🖥 *CPU Usage*: `{cpu_percent}%`
@@ -194,12 +260,13 @@ def reset_usage_user_command(call: types.CallbackQuery):
 @bot.callback_query_handler(cb_query_equals('edit_all'), is_admin=True)
 def edit_all_command(call: types.CallbackQuery):
     with GetDB() as db:
-        total_users = crud.get_users_count(db)
-        active_users = crud.get_users_count(db, UserStatus.active)
-        disabled_users = crud.get_users_count(db, UserStatus.disabled)
-        expired_users = crud.get_users_count(db, UserStatus.expired)
-        limited_users = crud.get_users_count(db, UserStatus.limited)
-        onhold_users = crud.get_users_count(db, UserStatus.on_hold)
+        counts = crud.count_users_by_status(db)
+        total_users = sum(counts.values())
+        active_users = counts[UserStatus.active]
+        disabled_users = counts[UserStatus.disabled]
+        expired_users = counts[UserStatus.expired]
+        limited_users = counts[UserStatus.limited]
+        onhold_users = counts[UserStatus.on_hold]
         text = f"""
 👥 *Total Users*: `{total_users}`
 ✅ *Active Users*: `{active_users}`
@@ -566,7 +633,7 @@ def users_command(call: types.CallbackQuery):
     page = int(call.data.split(':')[1]) if len(call.data.split(':')) > 1 else 1
     with GetDB() as db:
         total_pages = math.ceil(crud.get_users_count(db) / 10)
-        users = crud.get_users(db, offset=(page - 1) * 10, limit=10, sort=[crud.UsersSortingOptions["-created_at"]])
+        users = crud.get_user_summaries(db, offset=(page - 1) * 10, limit=10, sort=[crud.UsersSortingOptions["-created_at"]])
         text = """👥 Users: (Page {page}/{total_pages})
 ✅ Active
 ❌ Disabled
@@ -816,7 +883,7 @@ def template_charge_command(call: types.CallbackQuery):
                 data_limit=template.data_limit,
             )
             db_user = crud.update_user(db, db_user, modify)
-            xray.operations.add_user(db_user)
+            sync_users({db_user.id: db_user.username})
             bot.answer_callback_query(call.id, "🔋 User Successfully Charged!")
             bot.edit_message_text(
                 get_user_info_text(db_user),
@@ -1477,6 +1544,95 @@ def select_protocols(call: types.CallbackQuery):
     )
 
 
+def bulk_usernames(username: str, number: int) -> list:
+    """Usernames of a bulk creation: the trailing number of `username` counts up, or 2, 3, ... is appended."""
+    if n := get_number_at_end(username):
+        return [username.replace(n, str(int(n) + i)) for i in range(number)]
+    return [username + (str(i + 1) if i > 0 else "") for i in range(number)]
+
+
+def add_inbound_users(clients: dict):
+    """Adds clients, built by dep.xray.config.client_builder, grouped by inbound tag to the core and the connected nodes."""
+    apis = [xray.api] + [node.api for node in list(xray.nodes.values()) if node.connected and node.started]
+    for api in apis:
+        for tag, tag_clients in clients.items():
+            for client in tag_clients:
+                try:
+                    api.add_inbound_user(tag=tag, user=client, timeout=30)
+                except (xray.exc.EmailExistsError, xray.exc.ConnectionError):
+                    pass
+
+
+def bulk_add_users(call: types.CallbackQuery, inbounds: dict, proxies: dict, user_status: str, number: int):
+    chat_id = call.message.chat.id
+    for proxy_type in proxies:
+        if not xray.config.inbounds_by_protocol.get(proxy_type):
+            return bot.answer_callback_query(
+                call.id,
+                f'❌ Protocol {proxy_type} is disabled on your server',
+                show_alert=True
+            )
+
+    data_limit = mem_store.get(f'{chat_id}:data_limit') or None
+    expire_date = mem_store.get(f'{chat_id}:expire_date')
+    if user_status == 'onhold':
+        expire_days = expire_date
+        if isinstance(expire_days, datetime):
+            expire_days = (expire_days - datetime.now()).days
+        status = UserStatus.on_hold
+        values = dict(
+            data_limit=data_limit,
+            on_hold_expire_duration=int(expire_days) * 24 * 60 * 60,
+            on_hold_timeout=mem_store.get(f'{chat_id}:onhold_timeout'))
+    else:
+        status = UserStatus.active
+        values = dict(
+            data_limit=data_limit,
+            expire=int(expire_date.timestamp()) if expire_date else None)
+
+    usernames = bulk_usernames(mem_store.get(f'{chat_id}:username'), number)
+    with GetDB() as db:
+        result = crud.bulk_create_users(
+            db, usernames, proxies, inbounds, xray.config.inbounds_by_protocol, status=status, **values)
+    if result.conflicts:
+        return bot.answer_callback_query(
+            call.id,
+            f'❌ Username already exists: {", ".join(result.conflicts[:10])}',
+            show_alert=True
+        )
+
+    started = time.perf_counter()
+    apply_client_delta(shared_index(xray.config).refresh_db_users([user.id for user in result.users]))
+    result.timings['xray'] = time.perf_counter() - started
+    timings = ", ".join(f"{stage}: {seconds:.2f}s" for stage, seconds in result.timings.items())
+
+    schedule_delete_message(chat_id, call.message.id)
+    cleanup_messages(chat_id)
+    bot.send_message(
+        chat_id,
+        f'✅ <code>{len(result.users)}</code> <b>Users Created</b>\n'
+        f'<code>{result.users[0].username}</code> ... <code>{result.users[-1].username}</code>\n'
+        f'⏱ <code>{timings}</code>',
+        parse_mode="HTML",
+        reply_markup=BotKeyboard.main_menu())
+
+    if TELEGRAM_LOGGER_CHANNEL_ID:
+        text = f"""\
+🆕 <b>#Created #Bulk #From_Bot</b>
+➖➖➖➖➖➖➖➖➖
+<b>Count :</b> <code>{len(result.users)}</code>
+<b>Usernames :</b> <code>{result.users[0].username}</code> ... <code>{result.users[-1].username}</code>
+<b>Status :</b> <code>{'Active' if user_status == 'active' else 'On Hold'}</code>
+<b>Traffic Limit :</b> <code>{readable_size(data_limit) if data_limit else "Unlimited"}</code>
+<b>Proxies :</b> <code>{", ".join(proxies)}</code>
+➖➖➖➖➖➖➖➖➖
+<b>By :</b> <a href="tg://user?id={call.from_user.id}">{call.from_user.full_name}</a>"""
+        try:
+            bot.send_message(TELEGRAM_LOGGER_CHANNEL_ID, text, 'HTML')
+        except ApiTelegramException:
+            pass
+
+
 @bot.callback_query_handler(cb_query_startswith('confirm:'), is_admin=True)
 def confirm_user_command(call: types.CallbackQuery):
     data = call.data.split(':')[1]
@@ -1494,8 +1650,9 @@ def confirm_user_command(call: types.CallbackQuery):
         username = call.data.split(':')[2]
         with GetDB() as db:
             db_user = crud.get_user(db, username)
+            user_id, username = db_user.id, db_user.username
             crud.remove_user(db, db_user)
-            xray.operations.remove_user(db_user)
+            sync_users({user_id: username})
 
         bot.edit_message_text(
             '✅ User deleted.',
@@ -1523,7 +1680,7 @@ def confirm_user_command(call: types.CallbackQuery):
             db_user = crud.get_user(db, username)
             crud.update_user(db, db_user, UserModify(
                 status=UserStatusModify.disabled))
-            xray.operations.remove_user(db_user)
+            sync_users({db_user.id: db_user.username})
             bot.edit_message_text(
                 get_user_info_text(db_user),
                 call.message.chat.id,
@@ -1547,7 +1704,7 @@ def confirm_user_command(call: types.CallbackQuery):
             db_user = crud.get_user(db, username)
             crud.update_user(db, db_user, UserModify(
                 status=UserStatusModify.active))
-            xray.operations.add_user(db_user)
+            sync_users({db_user.id: db_user.username})
             bot.edit_message_text(
                 get_user_info_text(db_user),
                 call.message.chat.id,
@@ -1570,8 +1727,7 @@ def confirm_user_command(call: types.CallbackQuery):
         with GetDB() as db:
             db_user = crud.get_user(db, username)
             crud.reset_user_data_usage(db, db_user)
-            if db_user.status in [UserStatus.active, UserStatus.on_hold]:
-                xray.operations.add_user(db_user)
+            sync_users({db_user.id: db_user.username})
             user = UserResponse.model_validate(db_user)
             bot.edit_message_text(
                 get_user_info_text(db_user),
@@ -1593,7 +1749,8 @@ def confirm_user_command(call: types.CallbackQuery):
     elif data == 'restart':
         m = bot.edit_message_text(
             '🔄 Restarting XRay core...', call.message.chat.id, call.message.message_id)
-        config = xray.config.include_db_users()
+        # the panel and its jobs change users too, the index is reloaded so the core matches the database
+        config = shared_index(xray.config, reload=True).config()
         xray.core.restart(config)
         for node_id, node in list(xray.nodes.items()):
             if node.connected:
@@ -1647,7 +1804,7 @@ def confirm_user_command(call: types.CallbackQuery):
                     data_limit=(user.data_limit or 0) - user.used_traffic + template.data_limit,
                 )
             db_user = crud.update_user(db, db_user, modify)
-            xray.operations.add_user(db_user)
+            sync_users({db_user.id: db_user.username})
             bot.answer_callback_query(call.id, "🔋 User Successfully Charged!")
             bot.edit_message_text(
                 get_user_info_text(db_user),
@@ -1738,8 +1895,7 @@ def confirm_user_command(call: types.CallbackQuery):
 
             user = UserResponse.model_validate(db_user)
 
-            if user.status == UserStatus.active:
-                xray.operations.update_user(db_user)
+            sync_users({db_user.id: db_user.username})
 
             bot.answer_callback_query(call.id, "✅ User updated successfully.")
             bot.edit_message_text(
@@ -1814,6 +1970,8 @@ def confirm_user_command(call: types.CallbackQuery):
         number = mem_store.get(f'{call.message.chat.id}:number', 1)
         if not mem_store.get(f"{call.message.chat.id}:is_bulk", False):
             number = 1
+        elif number > 1:
+            return bulk_add_users(call, inbounds, original_proxies, user_status, number)
 
         for i in range(number):
             proxies = copy.deepcopy(original_proxies)
@@ -1859,7 +2017,7 @@ def confirm_user_command(call: types.CallbackQuery):
                     db_user = crud.create_user(db, new_user)
                     proxies = db_user.proxies
                     user = UserResponse.model_validate(db_user)
-                    xray.operations.add_user(db_user)
+                    sync_users({db_user.id: db_user.username})
                     if mem_store.get(f"{call.message.chat.id}:is_bulk", False):
                         schedule_delete_message(call.message.chat.id, call.message.id)
                         cleanup_messages(call.message.chat.id)
@@ -1915,28 +2073,30 @@ def confirm_user_command(call: types.CallbackQuery):
             call.message.chat.id,
             call.message.message_id,
             parse_mode="HTML")
-        with GetDB() as db:
-            depleted_users = crud.get_users(
-                db, status=[UserStatus.limited if data == 'delete_limited' else UserStatus.expired])
-            file_name = f'{data[8:]}_users_{int(now.timestamp() * 1000)}.txt'
-            with open(file_name, 'w') as f:
-                f.write('USERNAME\tEXIPRY\tUSAGE/LIMIT\tSTATUS\n')
-                deleted = 0
-                for user in depleted_users:
+        status = UserStatus.limited if data == 'delete_limited' else UserStatus.expired
+        with GetDB() as db, new_audit_export(f'{data[8:]}_users_{int(now.timestamp() * 1000)}') as export:
+            remaining = crud.get_users_count(db, status=status)
+            deleted = 0
+            last_progress = time.monotonic()
+            for chunk in crud.bulk_delete_users(db, data, status, xray.config.inbounds_by_protocol):
+                remove_inbound_users(chunk.removals)
+                for user in chunk.users:
+                    shared_index(xray.config).remove(user.id)
+                deleted = chunk.processed
+                remaining -= len(chunk.users)
+                export.write_rows(audit_rows(chunk.users))
+                if time.monotonic() - last_progress >= PROGRESS_UPDATE_INTERVAL:
+                    last_progress = time.monotonic()
                     try:
-                        crud.remove_user(db, user)
-                        xray.operations.remove_user(user)
-                        deleted += 1
-                        f.write(
-                            f'{user.username}\
-\t{datetime.fromtimestamp(user.expire) if user.expire else "never"}\
-\t{readable_size(user.used_traffic) if user.used_traffic else 0}\
-/{readable_size(user.data_limit) if user.data_limit else "Unlimited"}\
-\t{user.status}\n')
-                    except sqlalchemy.exc.IntegrityError:
-                        db.rollback()
+                        bot.edit_message_text(
+                            f'⏳ <b>In Progress...</b>\n<code>{deleted}</code> Deleted, <code>{remaining}</code> Left',
+                            call.message.chat.id,
+                            call.message.message_id,
+                            parse_mode="HTML")
+                    except ApiTelegramException:
+                        pass
             bot.edit_message_text(
-                f'✅ <code>{deleted}</code>/<code>{len(depleted_users)}</code> <b>{data[7:].title()} Users Deleted</b>',
+                f'✅ <code>{deleted}</code> <b>{data[7:].title()} Users Deleted</b>',
                 call.message.chat.id,
                 call.message.message_id,
                 parse_mode="HTML",
@@ -1948,40 +2108,23 @@ def confirm_user_command(call: types.CallbackQuery):
 <b>Count:</b> <code>{deleted}</code>
 ➖➖➖➖➖➖➖➖➖
 <b>By :</b> <a href="tg://user?id={chat_id}">{full_name}</a>"""
-                try:
-                    bot.send_document(TELEGRAM_LOGGER_CHANNEL_ID, open(
-                        file_name, 'rb'), caption=text, parse_mode='HTML')
-                    os.remove(file_name)
-                except ApiTelegramException:
-                    pass
+                send_audit_export(export, text)
     elif data == 'add_data':
         schedule_delete_message(
             call.message.chat.id,
             bot.send_message(chat_id, '⏳ <b>In Progress...</b>', 'HTML').id)
         data_limit = float(call.data.split(":")[2]) * 1024 * 1024 * 1024
-        with GetDB() as db:
-            users = crud.get_users(db)
+        with GetDB() as db, new_audit_export(f'new_data_limit_users_{int(now.timestamp() * 1000)}') as export:
+            total = crud.get_users_count(db)
             counter = 0
-            file_name = f'new_data_limit_users_{int(now.timestamp() * 1000)}.txt'
-            with open(file_name, 'w') as f:
-                f.write('USERNAME\tEXIPRY\tUSAGE/LIMIT\tSTATUS\n')
-                for user in users:
-                    try:
-                        if user.data_limit and user.status not in [UserStatus.limited, UserStatus.expired]:
-                            user = crud.update_user(db, user, UserModify(data_limit=(user.data_limit + data_limit)))
-                            counter += 1
-                            f.write(
-                                f'{user.username}\
-\t{datetime.fromtimestamp(user.expire) if user.expire else "never"}\
-\t{readable_size(user.used_traffic) if user.used_traffic else 0}\
-/{readable_size(user.data_limit) if user.data_limit else "Unlimited"}\
-\t{user.status}\n')
-                    except sqlalchemy.exc.IntegrityError:
-                        db.rollback()
+            for users in crud.bulk_add_data_limit(db, int(data_limit)):
+                apply_client_delta(shared_index(xray.config).refresh_db_users([user.id for user in users]))
+                counter += len(users)
+                export.write_rows(audit_rows(users))
             cleanup_messages(chat_id)
             bot.send_message(
                 chat_id,
-                f'✅ <b>{counter}/{len(users)} Users</b> Data Limit according to <code>{"+" if data_limit >
+                f'✅ <b>{counter}/{total} Users</b> Data Limit according to <code>{"+" if data_limit >
                                                                                               0 else "-"}{readable_size(abs(data_limit))}</code>',
                 'HTML',
                 reply_markup=BotKeyboard.main_menu())
@@ -1993,45 +2136,24 @@ def confirm_user_command(call: types.CallbackQuery):
 <b>Count:</b> <code>{counter}</code>
 ➖➖➖➖➖➖➖➖➖
 <b>By :</b> <a href="tg://user?id={chat_id}">{full_name}</a>"""
-                try:
-                    bot.send_document(TELEGRAM_LOGGER_CHANNEL_ID, open(
-                        file_name, 'rb'), caption=text, parse_mode='HTML')
-                    os.remove(file_name)
-                except ApiTelegramException:
-                    pass
+                send_audit_export(export, text)
 
     elif data == 'add_time':
         schedule_delete_message(
             call.message.chat.id,
             bot.send_message(chat_id, '⏳ <b>In Progress...</b>', 'HTML').id)
         days = int(call.data.split(":")[2])
-        with GetDB() as db:
-            users = crud.get_users(db)
+        with GetDB() as db, new_audit_export(f'new_expiry_users_{int(now.timestamp() * 1000)}') as export:
+            total = crud.get_users_count(db)
             counter = 0
-            file_name = f'new_expiry_users_{int(now.timestamp() * 1000)}.txt'
-            with open(file_name, 'w') as f:
-                f.write('USERNAME\tEXIPRY\tUSAGE/LIMIT\tSTATUS\n')
-                for user in users:
-                    try:
-                        if user.expire and user.status not in [UserStatus.limited, UserStatus.expired]:
-                            user = crud.update_user(
-                                db, user,
-                                UserModify(
-                                    expire=int(
-                                        (datetime.fromtimestamp(user.expire) + relativedelta(days=days)).timestamp())))
-                            counter += 1
-                            f.write(
-                                f'{user.username}\
-\t{datetime.fromtimestamp(user.expire) if user.expire else "never"}\
-\t{readable_size(user.used_traffic) if user.used_traffic else 0}\
-/{readable_size(user.data_limit) if user.data_limit else "Unlimited"}\
-\t{user.status}\n')
-                    except sqlalchemy.exc.IntegrityError:
-                        db.rollback()
+            for users in crud.bulk_add_expire(db, days * 24 * 60 * 60):
+                apply_client_delta(shared_index(xray.config).refresh_db_users([user.id for user in users]))
+                counter += len(users)
+                export.write_rows(audit_rows(users))
             cleanup_messages(chat_id)
             bot.send_message(
                 chat_id,
-                f'✅ <b>{counter}/{len(users)} Users</b> Expiry Changes according to {days} Days',
+                f'✅ <b>{counter}/{total} Users</b> Expiry Changes according to {days} Days',
                 'HTML',
                 reply_markup=BotKeyboard.main_menu())
             if TELEGRAM_LOGGER_CHANNEL_ID:
@@ -2042,12 +2164,7 @@ def confirm_user_command(call: types.CallbackQuery):
 <b>Count:</b> <code>{counter}</code>
 ➖➖➖➖➖➖➖➖➖
 <b>By :</b> <a href="tg://user?id={chat_id}">{full_name}</a>"""
-                try:
-                    bot.send_document(TELEGRAM_LOGGER_CHANNEL_ID, open(
-                        file_name, 'rb'), caption=text, parse_mode='HTML')
-                    os.remove(file_name)
-                except ApiTelegramException:
-                    pass
+                send_audit_export(export, text)
     elif data in ['inbound_add', 'inbound_remove']:
         bot.edit_message_text(
             '⏳ <b>In Progress...</b>',
@@ -2085,8 +2202,7 @@ def confirm_user_command(call: types.CallbackQuery):
                             del proxies[protocol]
                     try:
                         user = crud.update_user(db, user, UserModify(inbounds=new_inbounds, proxies=proxies))
-                        if user.status == UserStatus.active:
-                            xray.operations.update_user(user)
+                        sync_users({user.id: user.username})
                     except:
                         db.rollback()
                         unsuccessful += 1
@@ -0,0 +1,81 @@
+"""
+Streaming audit exports for bulk operations.
+
+Rows are formatted from a generator into a SpooledTemporaryFile (optionally through a gzip
+stream), which stays in memory up to `max_memory` bytes and only then rolls over to a
+temporary file, so neither memory nor the working directory grows with the number of users.
+The finished buffer is uploaded as is, nothing is left on disk.
+"""
+import csv
+import gzip
+import io
+import json
+from tempfile import SpooledTemporaryFile
+from typing import IO, Iterable, Optional, Sequence
+
+EXPORT_FORMATS = {
+    "csv": "csv",
+    "tsv": "txt",
+    "ndjson": "ndjson",
+}
+
+
+class AuditExport:
+    def __init__(self,
+                 name: str,
+                 fields: Sequence[str],
+                 fmt: str = "tsv",
+                 compress: bool = False,
+                 max_memory: int = 1024 * 1024):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unsupported export format: {fmt}")
+
+        self.fields = tuple(fields)
+        self.fmt = fmt
+        self.file_name = f"{name}.{EXPORT_FORMATS[fmt]}" + (".gz" if compress else "")
+        self.rows = 0
+
+        self._buffer = SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+        self._gzip: Optional[gzip.GzipFile] = gzip.GzipFile(
+            fileobj=self._buffer, mode="wb", mtime=0) if compress else None
+        self._text = io.TextIOWrapper(self._gzip or self._buffer, encoding="utf-8", newline="")
+
+        if fmt == "ndjson":
+            self._writer = None
+        else:
+            self._writer = csv.writer(self._text, delimiter="\t" if fmt == "tsv" else ",", lineterminator="\n")
+            self._writer.writerow(self.fields)
+
+    def write_rows(self, rows: Iterable[Sequence]) -> int:
+        """Appends `rows` (sequences matching `fields`) and returns how many were written."""
+        written = 0
+        if self._writer is None:
+            for row in rows:
+                self._text.write(json.dumps(dict(zip(self.fields, row)), ensure_ascii=False, default=str) + "\n")
+                written += 1
+        else:
+            for row in rows:
+                self._writer.writerow(row)
+                written += 1
+        self.rows += written
+        return written
+
+    def open(self) -> IO[bytes]:
+        """Finishes the export and returns the buffer rewound for upload, write_rows can't be called afterwards."""
+        if self._text is not None:
+            self._text.flush()
+            self._text.detach()
+            self._text = None
+            if self._gzip is not None:
+                self._gzip.close()  # writes the trailer, the buffer stays open
+        self._buffer.seek(0)
+        return self._buffer
+
+    def close(self):
+        self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
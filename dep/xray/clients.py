@@ -0,0 +1,172 @@
+"""
+Incremental client index for generated xray configs.
+
+XRayConfig.include_db_users queries every active user and rebuilds all client lists.
+ClientIndex keeps the clients of each inbound keyed by user id instead, so a user change
+is applied as a delta (the clients to remove from / add to the core per inbound) and the
+full config is only emitted again when it is asked for after a change.
+
+The bot handlers keep one index per process (shared_index) and push the deltas of the users
+they change to the core. Other processes (the panel, its jobs) write to the same database,
+so the index is reloaded from it (load_db_users) before the core is restarted from it.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from dep.db import GetDB
+from dep.xray.config import XRayConfig, client_builder, query_user_proxies
+
+
+@dataclass
+class ClientDelta:
+    added: Dict[str, List[dict]] = field(default_factory=dict)  # inbound tag -> clients
+    removed: Dict[str, List[str]] = field(default_factory=dict)  # inbound tag -> client emails
+
+    def __bool__(self):
+        return bool(self.added or self.removed)
+
+    def merge(self, other: ClientDelta) -> ClientDelta:
+        for tag, clients in other.added.items():
+            self.added.setdefault(tag, []).extend(clients)
+        for tag, emails in other.removed.items():
+            self.removed.setdefault(tag, []).extend(emails)
+        return self
+
+
+class ClientIndex:
+    def __init__(self, config: XRayConfig):
+        self.base = config
+        self._builders = {inbound['tag']: client_builder(inbound) for inbound in config.inbounds}
+        self._clients: Dict[str, Dict[int, dict]] = {inbound['tag']: {} for inbound in config.inbounds}
+        self._tags_by_user: Dict[int, Set[str]] = {}
+        self._config: Optional[XRayConfig] = None
+
+    def __len__(self):
+        return len(self._tags_by_user)
+
+    def _user_clients(self, rows: Iterable[tuple]) -> Dict[str, dict]:
+        clients = {}
+        for user_id, username, proxy_type, settings, excluded_inbound_tags in rows:
+            for inbound in self.base.inbounds_by_protocol.get(proxy_type, ()):
+                if excluded_inbound_tags and inbound['tag'] in excluded_inbound_tags:
+                    continue
+                clients[inbound['tag']] = self._builders[inbound['tag']](user_id, username, settings)
+        return clients
+
+    def apply(self, user_id: int, rows: Iterable[tuple]) -> ClientDelta:
+        """
+        Replaces the clients of `user_id` with the ones built from `rows` (see query_user_proxies),
+        no rows removes the user. Unchanged clients are left alone and don't show up in the delta.
+        """
+        clients = self._user_clients(rows)
+        delta = ClientDelta()
+
+        for tag in self._tags_by_user.get(user_id, set()) - clients.keys():
+            client = self._clients[tag].pop(user_id)
+            delta.removed.setdefault(tag, []).append(client['email'])
+
+        for tag, client in clients.items():
+            current = self._clients[tag].get(user_id)
+            if current == client:
+                continue
+            if current is not None:
+                delta.removed.setdefault(tag, []).append(current['email'])
+            self._clients[tag][user_id] = client
+            delta.added.setdefault(tag, []).append(client)
+
+        if clients:
+            self._tags_by_user[user_id] = set(clients)
+        else:
+            self._tags_by_user.pop(user_id, None)
+
+        if delta:
+            self._config = None
+        return delta
+
+    def remove(self, user_id: int) -> ClientDelta:
+        return self.apply(user_id, ())
+
+    def load(self, rows: Iterable[tuple]) -> None:
+        """Replaces the whole index with `rows`."""
+        for clients in self._clients.values():
+            clients.clear()
+        self._tags_by_user.clear()
+        self._config = None
+
+        for user_id, user_rows in _group_by_user(rows).items():
+            self.apply(user_id, user_rows)
+
+    def load_db_users(self) -> None:
+        with GetDB() as db:
+            self.load(query_user_proxies(db))
+
+    def refresh_db_users(self, user_ids: List[int]) -> ClientDelta:
+        """Re-reads `user_ids` from the database, users that are no longer active or on hold are removed."""
+        with GetDB() as db:
+            grouped = _group_by_user(query_user_proxies(db, user_ids))
+
+        delta = ClientDelta()
+        for user_id in user_ids:
+            delta.merge(self.apply(user_id, grouped.get(user_id, ())))
+        return delta
+
+    def replace_db_users(self, users: Dict[int, str]) -> ClientDelta:
+        """
+        Re-reads `users` (id -> username) like refresh_db_users, but returns a delta that doesn't rely on
+        the index: their email is removed from every inbound and their current clients are added back.
+        Users may have been changed by another process since the index was loaded, so the core can hold
+        clients the index doesn't know about.
+        """
+        with GetDB() as db:
+            grouped = _group_by_user(query_user_proxies(db, list(users)))
+
+        delta = ClientDelta()
+        for user_id, username in users.items():
+            self.apply(user_id, grouped.get(user_id, ()))
+            email = f"{user_id}.{username}"
+            for tag in self._clients:
+                delta.removed.setdefault(tag, []).append(email)
+            for tag in self._tags_by_user.get(user_id, ()):
+                delta.added.setdefault(tag, []).append(self._clients[tag][user_id])
+        return delta
+
+    def config(self) -> XRayConfig:
+        """
+        The full config with every indexed client, rebuilt only when the index changed since the last call.
+        Its client dicts are the ones of the index, treat them as read-only.
+        """
+        if self._config is None:
+            config = self.base.clients_copy()
+            for tag, clients in self._clients.items():
+                if clients:
+                    config.get_inbound(tag)['settings']['clients'].extend(clients.values())
+            self._config = config
+        return self._config
+
+
+_shared: Optional[ClientIndex] = None
+
+
+def shared_index(config: XRayConfig, reload: bool = False) -> ClientIndex:
+    """
+    The process-wide index of `config`, loaded from the database on first use, when the config is
+    replaced or when `reload` is set.
+    """
+    global _shared
+    if _shared is None or _shared.base is not config:
+        index = ClientIndex(config)
+        index.load_db_users()
+        _shared = index
+    elif reload:
+        _shared.load_db_users()
+    return _shared
+
+
+def _group_by_user(rows: Iterable[tuple]) -> Dict[int, List[tuple]]:
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[0]].append(row)
+    return grouped
@@ -14,6 +14,7 @@ from dep.db import models as db_models
 from dep.models.proxy import ProxyTypes
 from dep.models.user import UserStatus
 from dep.utils.crypto import get_cert_SANs
+from dep.xray.encoder import ConfigEncoder
 from config import DEBUG, XRAY_EXCLUDE_INBOUND_TAGS, XRAY_FALLBACKS_INBOUND_TAG
 
 
@@ -52,6 +53,7 @@ class XRayConfig(dict):
 
         super().__init__(config)
         self._validate()
+        self._index_tags()
 
         self.inbounds = []
         self.inbounds_by_protocol = {}
@@ -334,6 +336,11 @@ class XRayConfig(dict):
                     elif host and isinstance(host, list):
                         settings['host'] = host[0]
 
+            # XTLS currently only supports transmission methods of TCP and mKCP
+            settings['flow_allowed'] = (settings['network'] in ('tcp', 'raw', 'kcp')
+                                        and settings['tls'] in ('tls', 'reality')
+                                        and settings['header_type'] != 'http')
+
             self.inbounds.append(settings)
             self.inbounds_by_tag[inbound['tag']] = settings
 
@@ -342,95 +349,167 @@ class XRayConfig(dict):
             except KeyError:
                 self.inbounds_by_protocol[inbound['protocol']] = [settings]
 
+    def _index_tags(self):
+        self._inbounds_index = _TagIndex(self.get('inbounds', []))
+        self._outbounds_index = _TagIndex(self.get('outbounds', []))
+
     def get_inbound(self, tag) -> dict:
-        for inbound in self['inbounds']:
-            if inbound['tag'] == tag:
-                return inbound
+        if not self._inbounds_index.covers(self.get('inbounds', [])):
+            self._inbounds_index = _TagIndex(self.get('inbounds', []))
+        return self._inbounds_index.get(tag)
 
     def get_outbound(self, tag) -> dict:
-        for outbound in self['outbounds']:
-            if outbound['tag'] == tag:
-                return outbound
+        if not self._outbounds_index.covers(self.get('outbounds', [])):
+            self._outbounds_index = _TagIndex(self.get('outbounds', []))
+        return self._outbounds_index.get(tag)
 
     def to_json(self, **json_kwargs):
         return json.dumps(self, **json_kwargs)
 
+    def dump(self, fp, indent=None):
+        """Streams the config as JSON to the binary file object `fp`, see dep.xray.encoder."""
+        ConfigEncoder(indent).dump(self, fp)
+
     def copy(self):
         return deepcopy(self)
 
-    def include_db_users(self) -> XRayConfig:
-        config = self.copy()
+    def clients_copy(self) -> XRayConfig:
+        """
+        Copy meant for adding clients: the inbounds list and the `settings.clients` lists of proxy
+        inbounds are fresh containers, everything else (other inbound keys, outbounds, routing,
+        certificates, resolved inbound settings) is shared with this config and must not be mutated.
+        """
+        config = XRayConfig.__new__(XRayConfig)
+        dict.update(config, self)
+        config.__dict__.update(self.__dict__)
+
+        inbounds = []
+        for inbound in self['inbounds']:
+            if inbound['tag'] in self.inbounds_by_tag:
+                settings = inbound['settings']
+                inbound = {**inbound, 'settings': {**settings, 'clients': list(settings['clients'])}}
+            inbounds.append(inbound)
+        config['inbounds'] = inbounds
+
+        return config
+
+    def include_users(self, rows) -> XRayConfig:
+        """Returns a copy of the config with the clients of `rows` (see query_user_proxies) added."""
+        config = self.clients_copy()
+
+        grouped_data = defaultdict(list)
+        for row in rows:
+            grouped_data[row[2]].append(row)
+
+        for proxy_type, rows in grouped_data.items():
 
+            inbounds = self.inbounds_by_protocol.get(proxy_type)
+            if not inbounds:
+                continue
+
+            for inbound in inbounds:
+                clients = config.get_inbound(inbound['tag'])['settings']['clients']
+                build = client_builder(inbound)
+
+                for row in rows:
+                    user_id, username, _, settings, excluded_inbound_tags = row
+
+                    if excluded_inbound_tags and inbound['tag'] in excluded_inbound_tags:
+                        continue
+
+                    clients.append(build(user_id, username, settings))
+
+        return config
+
+    def include_db_users(self) -> XRayConfig:
         with GetDB() as db:
-            query = db.query(
-                db_models.User.id,
-                db_models.User.username,
-                func.lower(db_models.Proxy.type).label('type'),
-                db_models.Proxy.settings,
-                func.group_concat(db_models.excluded_inbounds_association.c.inbound_tag).label('excluded_inbound_tags')
-            ).join(
-                db_models.Proxy, db_models.User.id == db_models.Proxy.user_id
-            ).outerjoin(
-                db_models.excluded_inbounds_association,
-                db_models.Proxy.id == db_models.excluded_inbounds_association.c.proxy_id
-            ).filter(
-                db_models.User.status.in_([UserStatus.active, UserStatus.on_hold])
-            ).group_by(
-                func.lower(db_models.Proxy.type),
-                db_models.User.id,
-                db_models.User.username,
-                db_models.Proxy.settings,
-            )
-            result = query.all()
-
-            grouped_data = defaultdict(list)
-
-            for row in result:
-                grouped_data[row.type].append((
-                    row.id,
-                    row.username,
-                    row.settings,
-                    [i for i in row.excluded_inbound_tags.split(',') if i] if row.excluded_inbound_tags else None
-                ))
-
-            for proxy_type, rows in grouped_data.items():
-
-                inbounds = self.inbounds_by_protocol.get(proxy_type)
-                if not inbounds:
-                    continue
-
-                for inbound in inbounds:
-                    clients = config.get_inbound(inbound['tag'])['settings']['clients']
-
-                    for row in rows:
-                        user_id, username, settings, excluded_inbound_tags = row
-
-                        if excluded_inbound_tags and inbound['tag'] in excluded_inbound_tags:
-                            continue
-
-                        client = {
-                            "email": f"{user_id}.{username}",
-                            **settings
-                        }
-
-                        # XTLS currently only supports transmission methods of TCP and mKCP
-                        if client.get('flow') and (
-                                inbound.get('network', 'tcp') not in ('tcp', 'raw', 'kcp')
-                                or
-                                (
-                                    inbound.get('network', 'tcp') in ('tcp', 'raw', 'kcp')
-                                    and
-                                    inbound.get('tls') not in ('tls', 'reality')
-                                )
-                                or
-                                inbound.get('header_type') == 'http'
-                        ):
-                            del client['flow']
-
-                        clients.append(client)
+            rows = query_user_proxies(db)
+        config = self.include_users(rows)
 
         if DEBUG:
-            with open('generated_config-debug.json', 'w') as f:
-                f.write(config.to_json(indent=4))
+            with open('generated_config-debug.json', 'wb') as f:
+                config.dump(f, indent=4)
 
         return config
+
+
+class _TagIndex:
+    """
+    Positions of tags in an inbounds/outbounds list, the first one wins like a linear scan would.
+
+    A hit is only trusted while the list is the indexed one and still has an item with that tag at
+    that position, a replaced list, an item removed, moved or replaced in place or a miss rebuilds it.
+    """
+
+    def __init__(self, items: list):
+        self.items = items
+        self.positions = {}
+        for i, item in enumerate(items):
+            self.positions.setdefault(item['tag'], i)
+
+    def covers(self, items: list) -> bool:
+        return items is self.items
+
+    def get(self, tag):
+        i = self.positions.get(tag)
+        if i is not None and i < len(self.items) and self.items[i].get('tag') == tag:
+            return self.items[i]
+
+        self.__init__(self.items)
+        i = self.positions.get(tag)
+        return self.items[i] if i is not None else None
+
+
+def _client_with_flow(user_id: int, username: str, settings: dict) -> dict:
+    return {"email": f"{user_id}.{username}", **settings}
+
+
+def _client_without_flow(user_id: int, username: str, settings: dict) -> dict:
+    client = {"email": f"{user_id}.{username}", **settings}
+    if client.get('flow'):
+        del client['flow']
+    return client
+
+
+def client_builder(inbound: dict):
+    """Client builder of a resolved inbound, picked once from its precomputed `flow_allowed` flag."""
+    return _client_with_flow if inbound['flow_allowed'] else _client_without_flow
+
+
+def query_user_proxies(db, user_ids=None) -> list:
+    """
+    Proxies of active and on hold users as (user_id, username, proxy_type, settings, excluded_inbound_tags)
+    rows, one per user and proxy type, optionally limited to `user_ids`.
+    """
+    query = db.query(
+        db_models.User.id,
+        db_models.User.username,
+        func.lower(db_models.Proxy.type).label('type'),
+        db_models.Proxy.settings,
+        func.group_concat(db_models.excluded_inbounds_association.c.inbound_tag).label('excluded_inbound_tags')
+    ).join(
+        db_models.Proxy, db_models.User.id == db_models.Proxy.user_id
+    ).outerjoin(
+        db_models.excluded_inbounds_association,
+        db_models.Proxy.id == db_models.excluded_inbounds_association.c.proxy_id
+    ).filter(
+        db_models.User.status.in_([UserStatus.active, UserStatus.on_hold])
+    )
+    if user_ids is not None:
+        query = query.filter(db_models.User.id.in_(user_ids))
+    query = query.group_by(
+        func.lower(db_models.Proxy.type),
+        db_models.User.id,
+        db_models.User.username,
+        db_models.Proxy.settings,
+    )
+
+    return [
+        (
+            row.id,
+            row.username,
+            row.type,
+            row.settings,
+            [i for i in row.excluded_inbound_tags.split(',') if i] if row.excluded_inbound_tags else None
+        ) for row in query.all()
+    ]
@@ -0,0 +1,104 @@
+"""
+Streaming JSON encoder for generated xray configs.
+
+json.dumps builds the whole document as one string, with a hundred thousand clients that is
+hundreds of megabytes held at once during a restart. The encoder walks the top level, the
+inbounds and their settings itself and encodes client lists a chunk at a time, every other
+value (outbounds, routing, a single client) is encoded as a whole, so only one chunk is in
+memory. orjson is used when it's installed, its 2 space indentation is rescaled to `indent`.
+
+Without orjson the output is byte-identical to json.dumps with the same indent.
+"""
+import json
+import re
+from typing import Iterator, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CLIENTS_CHUNK_SIZE = 1000
+WRITE_BUFFER_SIZE = 1 << 16
+
+# containers walked by the encoder instead of being encoded as a whole, '*' is any list item
+STREAMED_PATHS = {(), ('inbounds',), ('inbounds', '*'), ('inbounds', '*', 'settings')}
+CLIENTS_PATH = ('inbounds', '*', 'settings', 'clients')
+
+# indentation at the start of a line, newlines inside strings are escaped so every one is structural
+_LINE_INDENT = re.compile(rb'\n( +)')
+
+
+class ConfigEncoder:
+    def __init__(self, indent: Optional[int] = None, chunk_size: int = CLIENTS_CHUNK_SIZE):
+        self.indent = indent
+        self.chunk_size = chunk_size
+        self.fast = orjson is not None and (indent is None or indent > 0)
+        if indent is not None:
+            self.item_separator, self.key_separator = b',', b': '
+        elif self.fast:
+            self.item_separator, self.key_separator = b',', b':'
+        else:
+            self.item_separator, self.key_separator = b', ', b': '
+
+    def _newline(self, depth: int) -> bytes:
+        return b'' if self.indent is None else b'\n' + b' ' * (self.indent * depth)
+
+    def _encode(self, value, depth: int) -> bytes:
+        if self.fast:
+            data = orjson.dumps(value, option=orjson.OPT_INDENT_2 if self.indent else 0)
+            if self.indent and self.indent != 2:
+                data = _LINE_INDENT.sub(self._rescale_indent, data)
+        else:
+            data = json.dumps(value, indent=self.indent).encode()
+        if self.indent is not None and depth:
+            data = data.replace(b'\n', self._newline(depth))
+        return data
+
+    def _rescale_indent(self, match: re.Match) -> bytes:
+        return b'\n' + b' ' * (len(match.group(1)) // 2 * self.indent)
+
+    def iterencode(self, value, depth: int = 0, path: tuple = ()) -> Iterator[bytes]:
+        if path == CLIENTS_PATH and isinstance(value, list):
+            yield from self._iter_clients(value, depth)
+        elif path in STREAMED_PATHS and isinstance(value, dict) and value:
+            yield b'{'
+            for i, (key, item) in enumerate(value.items()):
+                yield (self.item_separator if i else b'') + self._newline(depth + 1) \
+                    + self._encode(key, 0) + self.key_separator
+                yield from self.iterencode(item, depth + 1, path + (key,))
+            yield self._newline(depth) + b'}'
+        elif path in STREAMED_PATHS and isinstance(value, list) and value:
+            yield b'['
+            for i, item in enumerate(value):
+                yield (self.item_separator if i else b'') + self._newline(depth + 1)
+                yield from self.iterencode(item, depth + 1, path + ('*',))
+            yield self._newline(depth) + b']'
+        else:
+            yield self._encode(value, depth)
+
+    def _iter_clients(self, clients: list, depth: int) -> Iterator[bytes]:
+        if not clients:
+            yield b'[]'
+            return
+
+        # a chunk is encoded as one list at the clients' depth, its brackets are dropped
+        closing = len(self._newline(depth)) + 1
+        yield b'['
+        for start in range(0, len(clients), self.chunk_size):
+            data = self._encode(clients[start:start + self.chunk_size], depth)[1:-closing]
+            yield (self.item_separator if start else b'') + data
+        yield self._newline(depth) + b']'
+
+    def dump(self, config: dict, fp) -> None:
+        """Writes `config` to the binary file object `fp` (use socket.makefile('wb') for sockets)."""
+        buffer, size = [], 0
+        for data in self.iterencode(config):
+            buffer.append(data)
+            size += len(data)
+            if size >= WRITE_BUFFER_SIZE:
+                fp.write(b''.join(buffer))
+                buffer.clear()
+                size = 0
+        if buffer:
+            fp.write(b''.join(buffer))
@@ -0,0 +1,30 @@
+"""
+Golden-file test of the clients XRayConfig.include_users generates for the combinations config
+and users of tests/xray_fixtures.py.
+
+tests/data/xray_client_builders.json was generated by the per-client flow condition that the
+per-inbound flow_allowed flag and client builders replaced, the output has to stay byte-identical.
+"""
+import os
+
+from dep.xray.config import XRayConfig
+from tests.xray_fixtures import combinations_config, user_rows
+
+GOLDEN_FILE = os.path.join(os.path.dirname(__file__), "data", "xray_client_builders.json")
+
+
+def test_include_users_matches_golden_file():
+    config = XRayConfig(combinations_config()).include_users(user_rows())
+
+    with open(GOLDEN_FILE) as f:
+        assert config.to_json(indent=4) + "\n" == f.read()
+
+
+def test_flow_allowed_only_on_tcp_raw_kcp_with_tls_or_reality_without_http_header():
+    config = XRayConfig(combinations_config())
+
+    assert sorted(inbound['tag'] for inbound in config.inbounds if inbound['flow_allowed']) == [
+        "VLESS_KCP_REALITY_NONE", "VLESS_KCP_TLS_NONE",
+        "VLESS_RAW_REALITY_NONE", "VLESS_RAW_TLS_NONE",
+        "VLESS_TCP_REALITY_NONE", "VLESS_TCP_TLS_NONE",
+    ]
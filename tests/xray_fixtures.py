@@ -0,0 +1,44 @@
+"""
+Xray configs and user rows shared by the tests and benchmarks/xray_client_builders.py: inbounds
+covering every network / security / header combination and users whose flow is set, empty or missing.
+"""
+import uuid
+
+NETWORKS = ('tcp', 'raw', 'kcp', 'ws', 'grpc', 'xhttp')
+SECURITIES = ('none', 'tls', 'reality')
+
+
+def combinations_config() -> dict:
+    inbounds = []
+    for network in NETWORKS:
+        for security in SECURITIES:
+            for header in ('none', 'http') if network in ('tcp', 'raw', 'kcp') else ('none',):
+                stream = {"network": network, "security": security}
+                if security == 'tls':
+                    stream["tlsSettings"] = {"certificates": []}
+                elif security == 'reality':
+                    stream["realitySettings"] = {"serverNames": ["example.com"], "publicKey": "pbk", "shortIds": [""]}
+                if header == 'http':
+                    stream[f"{network}Settings"] = {"header": {"type": "http", "request": {"path": ["/"]}}}
+                inbounds.append({
+                    "tag": f"VLESS_{network}_{security}_{header}".upper(),
+                    "port": 10000 + len(inbounds),
+                    "protocol": "vless",
+                    "settings": {"clients": [], "decryption": "none"},
+                    "streamSettings": stream,
+                })
+    return {"inbounds": inbounds, "outbounds": [{"protocol": "freedom", "tag": "DIRECT"}], "routing": {"rules": []}}
+
+
+def user_rows(users: int = 3) -> list:
+    """Users cycle through a set, an empty and a missing flow, every third one excludes VLESS_WS_TLS_NONE."""
+    flows = ("xtls-rprx-vision", "", None)
+    rows = []
+    for user_id in range(1, users + 1):
+        settings = {"id": str(uuid.UUID(int=user_id))}
+        flow = flows[(user_id - 1) % len(flows)]
+        if flow is not None:
+            settings["flow"] = flow
+        excluded_inbound_tags = ["VLESS_WS_TLS_NONE"] if user_id % len(flows) == 0 else None
+        rows.append((user_id, f"user{user_id}", "vless", settings, excluded_inbound_tags))
+    return rows